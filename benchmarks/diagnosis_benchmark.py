@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Diagnosis Creation Benchmark for Patient Management System
+Measures throughput and latency of concurrent diagnosis submissions
+
+Usage:
+    python benchmarks/diagnosis_benchmark.py --submissions 400 --threads 1,4,8
+
+Every submission posts the new diagnosis form, which also creates the
+prescription and the consultation payment. The current route writes the three
+rows in one transaction; it is compared with the previous behavior (one
+commit per row), registered here under a benchmark-only URL. "orphans" counts
+diagnoses left without their payment when a submission failed half-way.
+
+By default a throwaway SQLite file is used. Pass --database-url (or set
+DATABASE_URL) to benchmark a MySQL database; it is filled with synthetic
+patients and diagnoses, so never point it at real data.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PATIENTS = 50
+
+
+def register_three_commit_route(app, db, Diagnosis, Prescription, Payment, bump_counters, patient_has,
+                                payment_counter_deltas):
+    """The diagnosis form handler as it was before, committing each row on its own"""
+    from flask import request
+
+    def three_commits(patient_id):
+        form = request.form
+        if not patient_has(Diagnosis, patient_id):
+            bump_counters(patients_with_diagnoses=1)
+        db.session.add(Diagnosis(doctor_name=form['doctor_name'], professional_license=form['professional_license'],
+                                 symptoms=form['symptoms'], diagnosis=form['diagnosis'],
+                                 treatment_plan=form['treatment_plan'], notes=form['notes'], patient_id=patient_id))
+        db.session.commit()
+
+        treatment_plan = form['treatment_plan'].strip()
+        if treatment_plan:
+            if not patient_has(Prescription, patient_id):
+                bump_counters(patients_with_prescriptions=1)
+            db.session.add(Prescription(doctor_name=form['doctor_name'], professional_license=form['professional_license'],
+                                        diagnosis=form['diagnosis'], medications=treatment_plan,
+                                        instructions=f"Basado en el diagnóstico: {form['diagnosis']}. {treatment_plan}",
+                                        patient_id=patient_id))
+            db.session.commit()
+
+        payment = Payment(patient_id=patient_id, amount=float(form.get('consultation_amount', 300.00)),
+                          payment_date=datetime.now().date(), payment_method=form.get('payment_method', 'Cash'),
+                          service_type='Consulta General', status='Completed',
+                          notes=f"Pago automático por diagnóstico: {form['diagnosis']}")
+        db.session.add(payment)
+        bump_counters(**payment_counter_deltas(payment))
+        db.session.commit()
+        return '', 302
+
+    app.add_url_rule('/benchmark/<int:patient_id>/diagnosis/three-commits', 'benchmark_three_commits',
+                     three_commits, methods=['POST'])
+
+
+def submit(app, url_for_patient, submissions, results):
+    """Post diagnoses from one thread, recording (latency ms, ok) per submission"""
+    client = app.test_client()
+    for i in submissions:
+        form = {
+            'doctor_name': 'Dra. Ana López', 'professional_license': '12345678',
+            'symptoms': 'Fiebre y tos', 'diagnosis': f'Infección respiratoria {i}',
+            'treatment_plan': 'Paracetamol 500 mg cada 8 horas', 'notes': '',
+            'consultation_amount': '300.00', 'payment_method': 'Cash'
+        }
+        start = time.perf_counter()
+        try:
+            response = client.post(url_for_patient(i % PATIENTS + 1), data=form)
+            ok = response.status_code == 302
+        except Exception:
+            ok = False
+        results.append(((time.perf_counter() - start) * 1000, ok))
+
+
+def run(app, url_for_patient, submissions, threads):
+    results = []
+    chunks = [range(t, submissions, threads) for t in range(threads)]
+    workers = [threading.Thread(target=submit, args=(app, url_for_patient, chunk, results)) for chunk in chunks]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = [ms for ms, ok in results if ok]
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100)
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = latencies[0] if latencies else 0.0
+    return len(latencies) / elapsed, p50, p95, p99, len(results) - len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--submissions', type=int, default=400, help='diagnoses per route and thread count')
+    parser.add_argument('--threads', default='1,4,8', help='comma-separated numbers of concurrent submitters')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    args = parser.parse_args()
+
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        args.database_url = f"sqlite:///{scratch.name}"
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from flask import url_for
+    from app import (app, db, Patient, Diagnosis, Prescription, Payment, bump_counters, patient_has,
+                     payment_counter_deltas)
+
+    app.config['OUTBOX_WORKER'] = False
+    register_three_commit_route(app, db, Diagnosis, Prescription, Payment, bump_counters, patient_has,
+                                payment_counter_deltas)
+    routes = [('one transaction', 'main.new_diagnosis'), ('three commits', 'benchmark_three_commits')]
+
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Patient.id).count() < PATIENTS:
+            for i in range(PATIENTS):
+                db.session.add(Patient(name=f"Paciente Prueba {i}", email=f"paciente{i}@example.com",
+                                       phone='2291234567', date_of_birth=date(1980, 1, 15),
+                                       address='Av. Independencia 123, Veracruz', height=165.0, weight=68.0))
+            db.session.commit()
+        patient_ids = [row[0] for row in db.session.query(Patient.id).order_by(Patient.id).limit(PATIENTS)]
+
+    print("🩺 Diagnosis creation benchmark")
+    print(f"   database: {args.database_url}")
+    print(f"   {args.submissions} submissions per route and thread count, latency in ms\n")
+    print(f"{'threads':>8} {'route':>16} {'subm/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7} {'orphans':>8}")
+
+    for threads in sorted(int(t) for t in args.threads.split(',')):
+        for label, endpoint in routes:
+            with app.test_request_context():
+                urls = [url_for(endpoint, patient_id=patient_id) for patient_id in patient_ids]
+            with app.app_context():
+                before = (db.session.query(Diagnosis).count(), db.session.query(Payment).count())
+            throughput, p50, p95, p99, errors = run(app, lambda n: urls[n - 1], args.submissions, threads)
+            with app.app_context():
+                diagnoses = db.session.query(Diagnosis).count() - before[0]
+                payments = db.session.query(Payment).count() - before[1]
+            print(f"{threads:>8} {label:>16} {throughput:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} "
+                  f"{errors:>7} {diagnoses - payments:>8}")
+
+    if scratch is not None:
+        os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Email Report Benchmark for Patient Management System
+Measures throughput and latency of emailing patient reports against the local
+SMTP sink, and checks that every attachment arrives intact
+
+Usage:
+    python benchmarks/email_benchmark.py --messages 200 --delay 0.05 --connect-delay 0.1
+
+Every message goes through the real path: POST /patient/<id>/email_report
+renders (or reuses) the PDF and queues it, and the outbox worker sends it
+over the SMTP pool to a sink started in this process. Three sender setups are
+compared: a new connection per message sent one at a time (how email worked
+before the pool), pooled sessions one at a time, and pooled sessions with
+--concurrency messages in flight. "queue" is the HTTP request latency,
+"delivery" the time from the request to the sink accepting the message.
+
+--delay and --connect-delay slow the sink's DATA and EHLO replies down to
+simulate a slow provider. A throwaway SQLite database is used. Needs aiosmtpd
+(requirements-dev.txt).
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_sink import attachments, start_sink
+
+PATIENTS = 20
+
+
+def percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(values, n=100)
+    return cuts[49], cuts[94], cuts[98]
+
+
+class Receipts:
+    """Messages accepted by the sink, keyed by recipient"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.arrived = {}
+        self.done = threading.Event()
+        self.expected = 0
+
+    def reset(self, expected):
+        with self.lock:
+            self.arrived = {}
+            self.expected = expected
+            self.done.clear()
+
+    def __call__(self, received_at, recipients, raw):
+        with self.lock:
+            for recipient in recipients:
+                self.arrived[recipient] = (received_at, raw)
+            if len(self.arrived) >= self.expected:
+                self.done.set()
+
+
+def run_variant(app, db, OutgoingEmail, receipts, reports, args, label, pool_messages, concurrency):
+    """Queue ``args.messages`` report emails and wait for the sink to get them all"""
+    with app.app_context():
+        db.session.execute(db.delete(OutgoingEmail))
+        db.session.commit()
+    for name in ('email_outbox_worker', 'email_outbox', 'smtp_pool'):
+        extension = app.extensions.pop(name, None)
+        if name == 'email_outbox_worker' and extension is not None:
+            extension.stop()
+        elif name == 'smtp_pool' and extension is not None:
+            extension.close()
+    app.config.update(
+        OUTBOX_CONCURRENCY=concurrency,
+        SMTP_POOL_SIZE=max(concurrency, 1),
+        SMTP_POOL_MAX_MESSAGES=pool_messages
+    )
+    receipts.reset(args.messages)
+
+    client = app.test_client()
+    queued_at = {}
+    queue_ms = []
+    started = time.monotonic()
+    for i in range(args.messages):
+        recipient = f"bench{i}@example.com"
+        patient_id = i % PATIENTS + 1
+        request_start = time.monotonic()
+        response = client.post(f'/patient/{patient_id}/email_report', data={'recipient_email': recipient})
+        queue_ms.append((time.monotonic() - request_start) * 1000)
+        if response.status_code != 302:
+            raise RuntimeError(f"email_report returned {response.status_code}")
+        queued_at[recipient] = (request_start, patient_id)
+
+    receipts.done.wait(timeout=args.timeout)
+    finished = time.monotonic()
+    with receipts.lock:
+        arrived = dict(receipts.arrived)
+    with app.app_context():
+        pool_stats = dict(app.extensions['smtp_pool'].stats) if 'smtp_pool' in app.extensions else {}
+
+    delivery_ms = []
+    intact = corrupted = 0
+    for recipient, (request_start, patient_id) in queued_at.items():
+        if recipient not in arrived:
+            continue
+        received_at, raw = arrived[recipient]
+        delivery_ms.append((received_at - request_start) * 1000)
+        files = attachments(raw)
+        expected_name, expected_digest = reports[patient_id]
+        if len(files) == 1 and hashlib.sha256(files.get(expected_name, b'')).hexdigest() == expected_digest:
+            intact += 1
+        else:
+            corrupted += 1
+    missing = args.messages - len(delivery_ms)
+    last = max((arrived[r][0] for r in queued_at if r in arrived), default=finished)
+    throughput = len(delivery_ms) / max(last - started, 1e-9)
+
+    q50, q95, q99 = percentiles(queue_ms)
+    d50, d95, d99 = percentiles(delivery_ms)
+    row = (f"{label:>26} {throughput:>8.1f} {q50:>7.1f} {q95:>7.1f} {q99:>7.1f} "
+           f"{d50:>8.0f} {d95:>8.0f} {d99:>8.0f} {pool_stats.get('connects', 0):>6}")
+    return row, intact, corrupted, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200, help='report emails per sender setup')
+    parser.add_argument('--concurrency', type=int, default=4, help='messages in flight for the concurrent setup')
+    parser.add_argument('--delay', type=float, default=0.02, help='sink delay before accepting each message (s)')
+    parser.add_argument('--connect-delay', type=float, default=0.05, help='sink delay before answering EHLO (s)')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--timeout', type=float, default=300, help='seconds to wait for each setup to finish')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix='email_benchmark_')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(scratch, 'benchmark.db')}",
+        'PDF_CACHE_DIR': os.path.join(scratch, 'pdf_cache'),
+        'SMTP_SERVER': '127.0.0.1',
+        'SMTP_PORT': str(args.port),
+        'SMTP_USE_SSL': '0',
+        'SMTP_USE_TLS': '0',
+        'SMTP_PASSWORD': ''
+    })
+    receipts = Receipts()
+    controller = start_sink(args.port, delay=args.delay, connect_delay=args.connect_delay, on_message=receipts)
+
+    from app import app, db, Patient, OutgoingEmail
+    app.config.update(OUTBOX_RATE_LIMITS={}, OUTBOX_POLL_INTERVAL=1)
+
+    # Synthetic patients, and the report bytes every email about them must carry
+    reports = {}
+    with app.app_context():
+        db.create_all()
+        for i in range(PATIENTS):
+            db.session.add(Patient(name=f"Paciente Prueba {i}", email=f"paciente{i}@example.com", phone='2291234567',
+                                   date_of_birth=date(1980 + i, 1, 15), address='Av. Independencia 123, Veracruz',
+                                   height=165.0, weight=68.0, allergies='Penicilina'))
+        db.session.commit()
+    client = app.test_client()
+    for patient_id in range(1, PATIENTS + 1):
+        response = client.get(f'/patient/{patient_id}/report')
+        filename = response.headers['Content-Disposition'].split('filename=')[1].strip('"')
+        reports[patient_id] = (filename, hashlib.sha256(response.data).hexdigest())
+
+    print("📧 Email report benchmark")
+    print(f"   {args.messages} messages per setup, sink delay {args.delay * 1000:.0f} ms per message, "
+          f"{args.connect_delay * 1000:.0f} ms per connection")
+    print("   throughput in messages/s, latency in ms\n")
+    print(f"{'':>26} {'msg/s':>8} {'queue':>7} {'':>7} {'':>7} {'delivery':>8} {'':>8} {'':>8} {'conns':>6}")
+    print(f"{'sender':>26} {'':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'':>6}")
+
+    variants = [
+        ('new connection, 1 at a time', 1, 1),
+        ('pooled, 1 at a time', 1000, 1),
+        (f'pooled, {args.concurrency} at a time', 1000, args.concurrency),
+    ]
+    failures = 0
+    try:
+        for label, pool_messages, concurrency in variants:
+            # Keep the app's per-message log lines out of the table
+            with contextlib.redirect_stdout(io.StringIO()):
+                row, intact, corrupted, missing = run_variant(
+                    app, db, OutgoingEmail, receipts, reports, args, label, pool_messages, concurrency)
+            print(row)
+            if corrupted or missing:
+                failures += 1
+                print(f"   ❌ {label}: {corrupted} corrupted and {missing} missing attachments")
+    finally:
+        worker = app.extensions.get('email_outbox_worker')
+        if worker is not None:
+            worker.stop()
+        controller.stop()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if failures:
+        sys.exit(1)
+    print(f"\n✅ All {args.messages * len(variants)} attachments arrived intact")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Import Time Benchmark for Patient Management System
+Measures how long ``import app`` takes with ``python -X importtime`` and
+fails when startup regresses
+
+Usage:
+    python benchmarks/import_time.py --runs 5 --budget-ms 1000
+
+Every gunicorn worker and every maintenance script (update_database.py,
+reconcile_counters.py) imports app, so heavy libraries must only be loaded
+by the code paths that need them. The check fails (exit code 1) if any of
+HEAVY_MODULES is imported at startup or if the median import time is over
+the budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only the analytics (server charts), PDF and email paths may import these
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'reportlab', 'PIL', 'numpy', 'smtplib', 'email.mime')
+
+
+def parse_importtime(stderr):
+    """``(name, level, self_us, cumulative_us)`` for every line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), level, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module, database_url):
+    env = dict(os.environ, DATABASE_URL=database_url, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help='module to import')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1000, help='fail if the median import takes longer')
+    parser.add_argument('--top', type=int, default=10, help='slowest direct imports to list')
+    args = parser.parse_args()
+
+    # Importing app only creates the engine; it never connects, so any URL works
+    scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    scratch.close()
+    database_url = f"sqlite:///{scratch.name}"
+
+    print(f"⏱️  Import time of '{args.module}' ({args.runs} runs)")
+    try:
+        runs = [measure(args.module, database_url) for _ in range(args.runs)]
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return False
+    finally:
+        os.unlink(scratch.name)
+
+    totals = [next(cumulative for name, level, _, cumulative in rows if name == args.module and level == 0)
+              for rows in runs]
+    median_ms = statistics.median(totals) / 1000
+    print(f"   median {median_ms:.0f} ms, min {min(totals) / 1000:.0f} ms, max {max(totals) / 1000:.0f} ms\n")
+
+    # Direct imports of the module, from the run closest to the median
+    rows = min(runs, key=lambda r: abs(next(c for n, l, _, c in r if n == args.module and l == 0) / 1000 - median_ms))
+    direct = sorted((row for row in rows if row[1] == 1), key=lambda row: row[3], reverse=True)
+    print(f"{'cumulative ms':>14}  module")
+    for name, _, _, cumulative in direct[:args.top]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+    print()
+
+    ok = True
+    heavy = sorted({name for name, _, _, _ in rows
+                    if any(name == m or name.startswith(m + '.') for m in HEAVY_MODULES)})
+    if heavy:
+        print(f"❌ Heavy modules imported at startup: {', '.join(heavy[:10])}")
+        ok = False
+    if median_ms > args.budget_ms:
+        print(f"❌ Median import time {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+        ok = False
+    if ok:
+        print(f"✅ No heavy modules at startup, median {median_ms:.0f} ms within the {args.budget_ms:.0f} ms budget")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+PDF Style Setup Benchmark for Patient Management System
+Compares the per-document style setup of the PDF builders before and after
+the shared registry in pdf_styles.py
+
+Usage:
+    python benchmarks/pdf_styles_benchmark.py --documents 2000
+
+"before" repeats what every PDF route used to do for each document: build a
+fresh getSampleStyleSheet(), derive its ParagraphStyles and, for the patient
+report, four copies of the grey/beige TableStyle. "after" looks the same
+styles up in the process-wide registry. Both are also timed as part of a
+complete two-table patient report, to show what share of a document the
+setup was. No database is needed.
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from pdf_styles import get_pdf_styles
+
+PERSONAL_DATA = [
+    ['Name', 'María Hernández García'],
+    ['Email', 'maria.hernandez@example.com'],
+    ['Phone', '2291234567'],
+    ['Date of Birth', 'March 14, 1985'],
+    ['Address', 'Av. Independencia No. 123, Veracruz'],
+    ['Height', '162.0 cm'],
+    ['Weight', '61.5 kg'],
+    ['BMI', '23.4']
+]
+MEDICAL_DATA = [
+    ['Past Illnesses', 'Varicela'],
+    ['Current Medications', 'None'],
+    ['Allergies', 'Penicilina'],
+    ['Food Habits', 'None']
+]
+
+
+def legacy_table_style(header_font_size):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+def legacy_setup():
+    """Style objects one patient report used to build for itself"""
+    styles = getSampleStyleSheet()
+    title = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=16, spaceAfter=30, alignment=1)
+    tables = [legacy_table_style(size) for size in (12, 12, 10, 8)]
+    return title, styles['Heading2'], tables
+
+
+def shared_setup():
+    """The same style objects from the shared registry"""
+    styles = get_pdf_styles()
+    tables = [styles.data_table(size) for size in (12, 12, 10, 8)]
+    return styles.report_title, styles.heading, tables
+
+
+def build_report(setup):
+    title, heading, tables = setup()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    personal = Table(PERSONAL_DATA, colWidths=[2*inch, 4*inch])
+    personal.setStyle(tables[0])
+    medical = Table(MEDICAL_DATA, colWidths=[2*inch, 4*inch])
+    medical.setStyle(tables[1])
+    doc.build([
+        Paragraph("Patient Report - María Hernández García", title),
+        Spacer(1, 12),
+        Paragraph("Personal Information", heading),
+        personal,
+        Spacer(1, 12),
+        Paragraph("Medical History", heading),
+        medical
+    ])
+    return buffer.getbuffer().nbytes
+
+
+def measure(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(timings), statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=2000, help='setups timed per variant')
+    parser.add_argument('--reports', type=int, default=200, help='complete reports built per variant')
+    args = parser.parse_args()
+
+    # Warm up imports, fonts and the registry so only steady-state cost is measured
+    build_report(legacy_setup)
+    build_report(shared_setup)
+
+    print("📄 PDF style setup benchmark (µs per document)\n")
+    print(f"{'':>22} {'median':>10} {'mean':>10}")
+    rows = [
+        ('setup before', measure(legacy_setup, args.documents)),
+        ('setup after', measure(shared_setup, args.documents)),
+        ('full report before', measure(lambda: build_report(legacy_setup), args.reports)),
+        ('full report after', measure(lambda: build_report(shared_setup), args.reports)),
+    ]
+    for label, (median, mean) in rows:
+        print(f"{label:>22} {median:>10.1f} {mean:>10.1f}")
+
+    before, after = rows[0][1][0], rows[1][1][0]
+    print(f"\n✅ Style setup is {before / max(after, 0.01):.0f}x cheaper; "
+          f"it was {before / rows[2][1][0]:.0%} of a complete patient report")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Connection Pool Benchmark for Patient Management System
+Measures request throughput and latency against the database pool size
+
+Usage:
+    python benchmarks/pool_benchmark.py --pool-sizes 1,2,4,8,16 --threads 16 --query-delay 0.005
+
+For every pool size a fresh app is built with create_app('production') and
+the pool options overridden, then --threads clients request patient pages
+concurrently. --query-delay holds each statement for that many seconds,
+like the network round trip and server time of a remote MySQL; the
+connection stays checked out meanwhile, which is what makes the pool size
+matter. Each row also shows what /api/db-pool reported: connections opened,
+the most connections in use at once and how long requests held them.
+Requests that waited longer than --pool-timeout for a connection get a 503.
+
+By default a throwaway SQLite file is used. Pass --database-url (or set
+DATABASE_URL) to benchmark a MySQL database; it is filled with synthetic
+patients, so never point it at real data.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PATIENTS = 50
+
+
+def seed(app, db, Patient, Payment):
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Patient.id).count() >= PATIENTS:
+            return
+        for i in range(PATIENTS):
+            patient = Patient(name=f"Paciente Prueba {i}", email=f"paciente{i}@example.com", phone='2291234567',
+                              date_of_birth=date(1980, 1, 15), address='Av. Independencia 123, Veracruz',
+                              height=165.0, weight=68.0)
+            db.session.add(patient)
+            for k in range(5):
+                db.session.add(Payment(patient=patient, amount=300.0, payment_date=date.today() - timedelta(days=k),
+                                       payment_method='Cash', service_type='Consulta General', status='Completed'))
+        db.session.commit()
+
+
+def client_thread(app, requests, results):
+    client = app.test_client()
+    for i in requests:
+        patient_id = i % PATIENTS + 1
+        url = f'/patient/{patient_id}' if i % 2 else f'/patient/{patient_id}/payments'
+        start = time.perf_counter()
+        status = client.get(url).status_code
+        results.append(((time.perf_counter() - start) * 1000, status))
+
+
+def run(args, create_app, db, pool_size):
+    app = create_app('production', {
+        'SQLALCHEMY_DATABASE_URI': args.database_url,
+        'SQLALCHEMY_ENGINE_OPTIONS': {
+            'pool_size': pool_size,
+            'max_overflow': args.max_overflow,
+            'pool_timeout': args.pool_timeout,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True
+        },
+        'OUTBOX_WORKER': False
+    })
+    with app.app_context():
+        engine = db.engine
+    if args.query_delay:
+        from sqlalchemy import event
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def slow_database(conn, cursor, statement, parameters, context, executemany):
+            time.sleep(args.query_delay)
+
+    results = []
+    chunks = [range(t, args.requests, args.threads) for t in range(args.threads)]
+    threads = [threading.Thread(target=client_thread, args=(app, chunk, results)) for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    metrics = app.test_client().get('/api/db-pool').get_json()
+    engine.dispose()
+
+    ok = [ms for ms, status in results if status == 200]
+    busy = sum(1 for _, status in results if status == 503)
+    cuts = statistics.quantiles(ok, n=100) if len(ok) >= 2 else [ok[0] if ok else 0.0] * 99
+    return (len(ok) / elapsed, cuts[49], cuts[94], cuts[98], busy, len(results) - len(ok) - busy, metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pool-sizes', default='1,2,4,8,16', help='comma-separated pool sizes')
+    parser.add_argument('--threads', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=800, help='requests per pool size')
+    parser.add_argument('--query-delay', type=float, default=0.005, help='seconds added to every statement')
+    parser.add_argument('--max-overflow', type=int, default=0)
+    parser.add_argument('--pool-timeout', type=int, default=5)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    args = parser.parse_args()
+
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        args.database_url = f"sqlite:///{scratch.name}"
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from app import app, create_app, db, Patient, Payment
+    seed(app, db, Patient, Payment)
+
+    print("🔌 Connection pool benchmark")
+    print(f"   database: {args.database_url}")
+    print(f"   {args.requests} requests from {args.threads} threads per pool size, "
+          f"{args.query_delay * 1000:.1f} ms per statement, max_overflow {args.max_overflow}")
+    print("   latency and held time in ms\n")
+    print(f"{'pool':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'503':>5} {'errors':>6} "
+          f"{'conns':>6} {'peak':>5} {'held':>7}")
+
+    for pool_size in sorted(int(size) for size in args.pool_sizes.split(',')):
+        throughput, p50, p95, p99, busy, errors, metrics = run(args, create_app, db, pool_size)
+        print(f"{pool_size:>5} {throughput:>8.1f} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {busy:>5} {errors:>6} "
+              f"{metrics['connects']:>6} {metrics['peak_in_use']:>5} {metrics['avg_held_ms']:>7.1f}")
+
+    if scratch is not None:
+        os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Query Plan Check for Patient Management System
+Runs EXPLAIN on every query the per-patient and listing routes issue, and
+fails if any of them reads a whole table
+
+Usage:
+    python benchmarks/query_plans.py
+    python benchmarks/query_plans.py --patients 20000 --verbose
+
+The routes are requested through the test client against a seeded database;
+each SELECT they send is captured and explained with the same parameters. A
+plan step that scans a table without an index ("SCAN payment" in SQLite,
+type ALL in MySQL) is reported, unless the table is small by design
+(dashboard_counters). Exits with status 1 when a full scan is found.
+
+By default a throwaway SQLite file is used. Pass --database-url (or set
+DATABASE_URL) to check a MySQL database; it is filled with synthetic
+patients, so never point it at real data.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tables whose full scan is expected: a handful of rows read in one go
+SMALL_TABLES = {'dashboard_counters'}
+
+
+def seed(db, Patient, Disease, Medication, Diagnosis, Prescription, Payment, patients, rng):
+    """Synthetic patients, each with a few rows in every per-patient table"""
+    now = datetime.utcnow()
+    today = date.today()
+    rows = {model: [] for model in (Disease, Medication, Diagnosis, Prescription, Payment)}
+    db.session.execute(Patient.__table__.insert(), [{
+        'name': f"Paciente Prueba {i}", 'email': f"paciente{i}@example.com", 'phone': f"229{i:07d}",
+        'date_of_birth': date(1940 + i % 80, 1 + i % 12, 1 + i % 28), 'address': 'Av. Independencia 123, Veracruz',
+        'height': 165.0, 'weight': 68.0, 'created_at': now - timedelta(minutes=i), 'updated_at': now
+    } for i in range(patients)])
+    patient_ids = [row[0] for row in db.session.execute(db.select(Patient.id))]
+    for patient_id in patient_ids:
+        for k in range(2):
+            day = today - timedelta(days=rng.randrange(730))
+            rows[Disease].append({'name': 'Hipertensión', 'diagnosis_date': day, 'status': rng.choice(['Active', 'Cured', 'Chronic']),
+                                  'patient_id': patient_id})
+            rows[Medication].append({'name': 'Losartán', 'dosage': '50 mg', 'frequency': 'Cada 24 horas', 'start_date': day,
+                                     'status': 'Active', 'patient_id': patient_id})
+            rows[Diagnosis].append({'date': day, 'doctor_name': 'Dra. Ana López', 'professional_license': '12345678',
+                                    'symptoms': 'Cefalea', 'diagnosis': 'Hipertensión', 'treatment_plan': 'Losartán',
+                                    'patient_id': patient_id, 'created_at': now})
+            rows[Prescription].append({'date': day, 'doctor_name': 'Dra. Ana López', 'professional_license': '12345678',
+                                       'diagnosis': 'Hipertensión', 'medications': 'Losartán', 'patient_id': patient_id,
+                                       'created_at': now})
+        for k in range(3):
+            rows[Payment].append({'patient_id': patient_id, 'amount': 300.0, 'payment_method': 'Cash',
+                                  'payment_date': today - timedelta(days=rng.randrange(730)),
+                                  'service_type': 'Consulta General', 'status': rng.choice(['Completed', 'Completed', 'Pending']),
+                                  'created_at': now})
+    for model, values in rows.items():
+        db.session.execute(model.__table__.insert(), values)
+    db.session.commit()
+    return patient_ids
+
+
+def full_scans(connection, statement, parameters):
+    """Tables a statement reads in full, according to the database's EXPLAIN"""
+    if connection.dialect.name == 'sqlite':
+        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        steps = [row[-1] for row in plan]
+        scanned = [step.split()[1] for step in steps
+                   if step.startswith('SCAN ') and ' USING ' not in step and not step.startswith(('SCAN (', 'SCAN CONSTANT'))]
+    else:
+        plan = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+        steps = [f"{row['table']}: {row['type']} {row['key'] or ''}" for row in plan]
+        scanned = [row['table'] for row in plan if row['type'] == 'ALL']
+    return [table for table in scanned if table not in SMALL_TABLES], steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=5000, help='synthetic patients to seed')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--verbose', action='store_true', help='print every plan')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        args.database_url = f"sqlite:///{scratch.name}"
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from sqlalchemy import event
+    from app import app, db, Patient, Disease, Medication, Diagnosis, Prescription, Payment
+
+    app.config['OUTBOX_WORKER'] = False
+    with app.app_context():
+        db.create_all()
+        patient_ids = seed(db, Patient, Disease, Medication, Diagnosis, Prescription, Payment,
+                           args.patients, random.Random(args.seed))
+        # Let the planner see the real row counts
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE' if db.engine.dialect.name == 'sqlite' else
+                                       'ANALYZE TABLE patient, disease, medication, diagnosis, prescription, payment')
+        engine = db.engine
+
+    patient_id = patient_ids[len(patient_ids) // 2]
+    month_ago = (date.today() - timedelta(days=30)).isoformat()
+    routes = [
+        '/',
+        '/patients',
+        f'/patient/{patient_id}',
+        f'/patient/{patient_id}/payments',
+        f'/patient/{patient_id}/prescriptions',
+        f'/patient/{patient_id}/diagnoses',
+        f'/patient/{patient_id}/report',
+        '/payments',
+        '/payments?status=Completed',
+        f'/payments?status=Pending&date_from={month_ago}',
+        f'/payments?date_from={month_ago}',
+    ]
+
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            captured.append((statement, parameters))
+
+    client = app.test_client()
+    for route in routes:
+        # The first request also fills caches (dashboard counters, PDFs); check the steady state
+        client.get(route)
+
+    print("🔎 Query plan check")
+    print(f"   database: {args.database_url}")
+    print(f"   {args.patients} patients\n")
+
+    failures = 0
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        for route in routes:
+            captured.clear()
+            response = client.get(route)
+            statements = list(captured)
+            problems = []
+            with engine.connect() as connection:
+                for statement, parameters in statements:
+                    scanned, steps = full_scans(connection, statement, parameters)
+                    if scanned:
+                        problems.append((statement, scanned, steps))
+                    elif args.verbose:
+                        print(f"   {' | '.join(steps)}")
+            mark = '✅' if response.status_code == 200 and not problems else '❌'
+            print(f"{mark} {route}  ({len(statements)} queries, HTTP {response.status_code})")
+            if response.status_code != 200:
+                failures += 1
+            for statement, scanned, steps in problems:
+                failures += 1
+                print(f"   full scan of {', '.join(scanned)}:")
+                print(f"   {' '.join(statement.split())}")
+                for step in steps:
+                    print(f"      {step}")
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+
+    if scratch is not None:
+        os.unlink(scratch.name)
+    if failures:
+        print(f"\n❌ {failures} problem(s) found")
+        sys.exit(1)
+    print("\n✅ Every query uses an index")
+
+
+if __name__ == "__main__":
+    main()
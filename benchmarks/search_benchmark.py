@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Patient Search Benchmark for Patient Management System
+Compares p50/p95 latency of the search backends against the original ILIKE query
+
+Usage:
+    python benchmarks/search_benchmark.py --sizes 10000,100000,1000000
+
+By default a throwaway SQLite file is used. Pass --database-url (or set
+DATABASE_URL) to benchmark a MySQL database; the fulltext backend is only
+measured on MySQL and needs the ft_patient_search index from
+update_database.py. The database is filled with synthetic patients, so never
+point it at real data.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIRST_NAMES = ['María', 'José', 'Juan', 'Guadalupe', 'Francisco', 'Ana', 'Luis', 'Sofía', 'Carlos', 'Fernanda',
+               'Miguel', 'Valeria', 'Jorge', 'Camila', 'Ricardo', 'Daniela', 'Alejandro', 'Lucía', 'Raúl', 'Mariana']
+LAST_NAMES = ['Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez', 'Rodríguez', 'Sánchez', 'Ramírez',
+              'Cruz', 'Flores', 'Gómez', 'Morales', 'Vázquez', 'Reyes', 'Jiménez', 'Torres', 'Díaz', 'Ruiz', 'Mendoza']
+STREETS = ['Av. Independencia', 'Calle Zaragoza', 'Blvd. Ávila Camacho', 'Calle Juárez', 'Av. Díaz Mirón',
+           'Calle Madero', 'Av. Cuauhtémoc', 'Calle Allende', 'Av. Salvador Díaz Mirón', 'Calle Hidalgo']
+CITIES = ['Veracruz', 'Boca del Río', 'Xalapa', 'Córdoba', 'Orizaba', 'Coatzacoalcos', 'Poza Rica', 'Tuxpan']
+
+
+def fake_patient(i, rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    now = datetime.utcnow()
+    return {
+        'name': f"{first} {last} {rng.choice(LAST_NAMES)}",
+        'email': f"{first.lower()}.{last.lower()}{i}@example.com",
+        'phone': f"229{rng.randrange(10**7):07d}",
+        'date_of_birth': date(rng.randrange(1940, 2020), rng.randrange(1, 13), rng.randrange(1, 29)),
+        'address': f"{rng.choice(STREETS)} No. {rng.randrange(1, 999)}, {rng.choice(CITIES)}, Veracruz",
+        'height': rng.uniform(145, 195),
+        'weight': rng.uniform(45, 120),
+        'created_at': now,
+        'updated_at': now,
+    }
+
+
+def fill_patients(db, Patient, target, rng, chunk=10000):
+    """Insert synthetic patients until the table holds ``target`` rows"""
+    current = db.session.query(db.func.count(Patient.id)).scalar()
+    while current < target:
+        batch = [fake_patient(current + i, rng) for i in range(min(chunk, target - current))]
+        db.session.execute(Patient.__table__.insert(), batch)
+        db.session.commit()
+        current += len(batch)
+
+
+def sample_queries(rng, count):
+    """Mix of prefixes as typed, infixes, phone fragments and misses"""
+    queries = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            word = rng.choice(FIRST_NAMES + LAST_NAMES)
+            queries.append(word[:rng.randrange(2, len(word) + 1)])
+        elif kind < 0.7:
+            queries.append(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"[:rng.randrange(6, 14)])
+        elif kind < 0.85:
+            queries.append(f"229{rng.randrange(10**4):04d}")
+        elif kind < 0.95:
+            queries.append(rng.choice(CITIES).lower())
+        else:
+            queries.append(f"zzq{rng.randrange(1000)}")
+    return queries
+
+
+def measure(backend, queries, limit=10):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.search(query, limit)
+        timings.append((time.perf_counter() - start) * 1000)
+    cuts = statistics.quantiles(timings, n=100)
+    return cuts[49], cuts[94], max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='comma-separated patient counts')
+    parser.add_argument('--queries', type=int, default=200, help='queries per backend and size')
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    scratch = None
+    if not args.database_url:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        args.database_url = f"sqlite:///{scratch.name}"
+    os.environ['DATABASE_URL'] = args.database_url
+
+    from app import app, db, Patient
+    from search import LikeSearchBackend, TrigramSearchBackend, MySQLFulltextSearchBackend
+
+    rng = random.Random(args.seed)
+    sizes = sorted(int(size) for size in args.sizes.split(','))
+
+    print("🔍 Patient search benchmark")
+    print(f"   database: {args.database_url}")
+    print(f"   {args.queries} queries per backend, latency in ms\n")
+    print(f"{'patients':>10} {'backend':>9} {'p50':>9} {'p95':>9} {'max':>9}   notes")
+
+    with app.app_context():
+        db.create_all()
+        is_mysql = db.engine.dialect.name == 'mysql'
+        for size in sizes:
+            fill_patients(db, Patient, size, rng)
+            queries = sample_queries(rng, args.queries)
+
+            backends = [LikeSearchBackend(db, Patient)]
+            trigram = TrigramSearchBackend(db, Patient, sync_interval=float('inf'))
+            start = time.perf_counter()
+            trigram.build()
+            build_seconds = time.perf_counter() - start
+            backends.append(trigram)
+            if is_mysql:
+                backends.append(MySQLFulltextSearchBackend(db, Patient))
+
+            for backend in backends:
+                p50, p95, worst = measure(backend, queries)
+                note = f"index built in {build_seconds:.1f}s" if backend is trigram else ''
+                print(f"{size:>10} {backend.name:>9} {p50:>9.2f} {p95:>9.2f} {worst:>9.2f}   {note}")
+            del trigram
+
+    if scratch is not None:
+        os.unlink(scratch.name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Local SMTP Sink for Patient Management System
+Accepts every message and drops it (or saves it), so email can be tested and
+benchmarked without a real provider
+
+Usage:
+    python benchmarks/smtp_sink.py --port 8025 --delay 0.2 --connect-delay 0.1
+
+Point the app at it with:
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=8025 SMTP_USE_SSL=0 SMTP_USE_TLS=0 SMTP_PASSWORD= python3 app.py
+
+--delay holds every DATA reply and --connect-delay every EHLO reply, to
+simulate a slow provider (the EHLO delay is paid once per connection, like a
+TLS handshake and login). Needs aiosmtpd (requirements-dev.txt).
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from email import message_from_bytes
+from email.policy import default as default_policy
+
+
+class SinkHandler:
+    """aiosmtpd handler that accepts everything after the configured delays"""
+
+    def __init__(self, delay=0.0, connect_delay=0.0, on_message=None):
+        self.delay = delay
+        self.connect_delay = connect_delay
+        self.on_message = on_message
+        self.messages = 0
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        if self.connect_delay:
+            await asyncio.sleep(self.connect_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages += 1
+        if self.on_message is not None:
+            self.on_message(time.monotonic(), envelope.rcpt_tos, envelope.content)
+        return '250 Message accepted for delivery'
+
+
+def start_sink(port=8025, host='127.0.0.1', **handler_options):
+    """Run a sink on a background thread; returns the started aiosmtpd Controller"""
+    from aiosmtpd.controller import Controller
+
+    controller = Controller(SinkHandler(**handler_options), hostname=host, port=port)
+    controller.start()
+    return controller
+
+
+def attachments(raw):
+    """``{filename: bytes}`` of the attachments of a raw message"""
+    message = message_from_bytes(raw, policy=default_policy)
+    return {part.get_filename(): part.get_content() for part in message.iter_attachments()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds before accepting each message')
+    parser.add_argument('--connect-delay', type=float, default=0.0, help='seconds before answering EHLO')
+    parser.add_argument('--save', metavar='DIR', help='write every message to DIR as .eml')
+    args = parser.parse_args()
+
+    if args.save:
+        os.makedirs(args.save, exist_ok=True)
+
+    def on_message(received_at, recipients, raw):
+        files = ', '.join(f"{name} ({len(data)} bytes)" for name, data in attachments(raw).items())
+        print(f"📨 {', '.join(recipients)}  {len(raw)} bytes  {files or 'no attachments'}")
+        if args.save:
+            path = os.path.join(args.save, f"{time.time():.6f}.eml")
+            with open(path, 'wb') as f:
+                f.write(raw)
+
+    controller = start_sink(args.port, args.host, delay=args.delay,
+                            connect_delay=args.connect_delay, on_message=on_message)
+    print(f"📧 SMTP sink listening on {args.host}:{args.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Chart rendering and caching for the analytics page
+
+Charts are rendered into bytes on a private matplotlib Figure (no pyplot
+global state, so concurrent requests cannot clobber each other) and cached
+in memory by a key that includes the version of the data they were drawn
+from. A chart is only redrawn when its data changes.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+CHART_MIMETYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+
+def render_pie(values, labels, title, colors=None, colormap=None, figsize=(10, 6), fmt='png', dpi=300):
+    """Render a pie chart and return the encoded image bytes"""
+    # matplotlib takes hundreds of milliseconds to import; only pay for it when drawing
+    import matplotlib
+    matplotlib.use('Agg')  # Use non-GUI backend
+    from matplotlib.figure import Figure
+    
+    fig = Figure(figsize=figsize)
+    ax = fig.subplots()
+    if colormap:
+        colors = matplotlib.colormaps[colormap](range(len(values)))
+    ax.pie(values, labels=labels, autopct='%1.1f%%', colors=colors)
+    ax.set_title(title)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, bbox_inches='tight', dpi=dpi)
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """Size-bounded LRU cache of rendered chart bytes.
+
+    ``get_or_render`` renders a missing chart at most once even when several
+    requests ask for it at the same time; the others wait for the result.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.render_locks = {}
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            if len(data) > self.max_bytes:
+                return
+            self.entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def get_or_render(self, key, render):
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self.lock:
+            render_lock = self.render_locks.setdefault(key, threading.Lock())
+        try:
+            with render_lock:
+                data = self.get(key)
+                if data is None:
+                    data = render()
+                    self.put(key, data)
+        finally:
+            with self.lock:
+                self.render_locks.pop(key, None)
+        return data
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
@@ -60,7 +60,8 @@ def create_tables(cursor):
         allergies TEXT,
         food_habits TEXT,
         created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX ix_patient_created_at_id (created_at, id)
     )
     """
     
@@ -73,6 +74,7 @@ def create_tables(cursor):
         status VARCHAR(50) DEFAULT 'Active',
         notes TEXT,
         patient_id INT NOT NULL,
+        INDEX ix_disease_patient_id (patient_id),
         FOREIGN KEY (patient_id) REFERENCES patient(id) ON DELETE CASCADE
     )
     """
@@ -89,6 +91,7 @@ def create_tables(cursor):
         status VARCHAR(50) DEFAULT 'Active',
         notes TEXT,
         patient_id INT NOT NULL,
+        INDEX ix_medication_patient_id (patient_id),
         FOREIGN KEY (patient_id) REFERENCES patient(id) ON DELETE CASCADE
     )
     """
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Bulk Report Export Script for Patient Management System
+Writes the reports of many patients to one ZIP file, rendered in parallel
+
+Usage:
+    python export_reports.py --ids 1,2,3 --output reports.zip
+    python export_reports.py --date-from 2024-01-01 --date-to 2024-06-30
+    python export_reports.py --diagnosed-from 2024-06-01 --diagnosed-to 2024-06-30
+    python export_reports.py --all --workers 8
+"""
+
+import argparse
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from werkzeug.datastructures import MultiDict
+
+from app import app, iter_report_data, parse_patient_selection, patient_selection_criteria
+from reports import export_filename, stream_reports_zip
+
+SELECTION_OPTIONS = ('ids', 'date_from', 'date_to', 'diagnosed_from', 'diagnosed_to')
+
+def selection_from_args(args):
+    """Patient selection from the command line, with the same rules as the web endpoints"""
+    return parse_patient_selection(MultiDict(
+        (key, getattr(args, key)) for key in SELECTION_OPTIONS if getattr(args, key)
+    ))
+
+def add_selection_arguments(parser):
+    parser.add_argument('--ids', help='comma separated patient ids')
+    parser.add_argument('--date-from', help='registered on or after (YYYY-MM-DD)')
+    parser.add_argument('--date-to', help='registered on or before (YYYY-MM-DD)')
+    parser.add_argument('--diagnosed-from', help='with a diagnosis on or after (YYYY-MM-DD)')
+    parser.add_argument('--diagnosed-to', help='with a diagnosis on or before (YYYY-MM-DD)')
+
+def export_reports(args):
+    """Stream the selected patients' reports into the output ZIP"""
+    try:
+        selection = selection_from_args(args)
+    except ValueError as e:
+        print(f"❌ Invalid selection: {e}")
+        return False
+    if not selection and not args.all:
+        print("❌ Select patients with --ids, --date-from/--date-to, --diagnosed-from/--diagnosed-to or --all")
+        return False
+
+    output = args.output or export_filename()
+    with app.app_context():
+        try:
+            criteria = patient_selection_criteria(selection)
+            size = 0
+            with open(output, 'wb') as f:
+                for chunk in stream_reports_zip(iter_report_data(criteria), workers=args.workers):
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception as e:
+            print(f"❌ Error exporting reports: {e}")
+            return False
+
+    print(f"✅ Reports written to {output} ({size / 1024:.0f} KB)")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_selection_arguments(parser)
+    parser.add_argument('--all', action='store_true', help='export every patient')
+    parser.add_argument('--workers', type=int, default=app.config['REPORT_EXPORT_WORKERS'], help='render processes (default: one per CPU)')
+    parser.add_argument('--output', help='ZIP file to write (default: patient_reports_<timestamp>.zip)')
+    sys.exit(0 if export_reports(parser.parse_args()) else 1)
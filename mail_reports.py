@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Bulk Report Mailing Script for Patient Management System
+Emails the reports of many patients, to each patient or to one provider
+
+Usage:
+    python mail_reports.py --diagnosed-from 2025-06-01 --diagnosed-to 2025-06-30
+    python mail_reports.py --ids 1,2,3 --provider-email referrals@clinic.example --send
+    python mail_reports.py --resume 4 --send
+    python mail_reports.py --status 4
+
+Reports are rendered in parallel and queued in the email outbox; they are
+sent by the web processes or send_outbox.py, or by this script with --send.
+A job that was interrupted is finished with --resume: reports already queued
+are not queued (or sent) again.
+"""
+
+import argparse
+import logging
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, MailJob, create_mail_job, get_outbox_worker, mail_job_progress, run_mail_job
+from export_reports import add_selection_arguments, selection_from_args
+
+def print_progress(progress):
+    print(f"📊 Job {progress['id']} ({progress['status']}): {progress['total']} selected, "
+          f"{progress['enqueued']} in the outbox, {progress['sent']} sent, {progress['failed']} failed, "
+          f"{progress['queued'] + progress['sending']} waiting, {progress['render_errors']} render errors")
+
+def wait_for_delivery(job_id, interval=2):
+    """Send from this process until none of the job's messages is waiting"""
+    with app.app_context():
+        worker = get_outbox_worker()
+    worker.wake()
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            progress = mail_job_progress(db.session.get(MailJob, job_id))
+        print_progress(progress)
+        if not progress['queued'] and not progress['sending']:
+            worker.stop()
+            return progress
+
+def mail_reports(args):
+    """Create or resume a mail job, queue its reports and optionally send them"""
+    # Without --send this process must not start sending (it may exit mid-send)
+    app.config['OUTBOX_WORKER'] = args.send
+
+    with app.app_context():
+        db.create_all()
+        if args.status:
+            job = db.session.get(MailJob, args.status)
+            if job is None:
+                print(f"❌ Mail job {args.status} not found")
+                return False
+            print_progress(mail_job_progress(job))
+            return True
+
+        if args.resume:
+            job = db.session.get(MailJob, args.resume)
+            if job is None:
+                print(f"❌ Mail job {args.resume} not found")
+                return False
+        else:
+            try:
+                selection = selection_from_args(args)
+            except ValueError as e:
+                print(f"❌ Invalid selection: {e}")
+                return False
+            if not selection:
+                print("❌ Select patients with --ids, --date-from/--date-to or --diagnosed-from/--diagnosed-to")
+                return False
+            job = create_mail_job(selection, args.provider_email)
+            print(f"📧 Created mail job {job.id}")
+        job_id = job.id
+
+        def on_enqueued(count):
+            if count % 25 == 0:
+                print(f"   {count} report(s) queued")
+
+        try:
+            job = run_mail_job(job_id, workers=args.workers, on_enqueued=on_enqueued)
+        except Exception as e:
+            print(f"❌ Error running mail job {job_id}: {e}")
+            print(f"   Run it again with --resume {job_id}")
+            return False
+        progress = mail_job_progress(job)
+    print_progress(progress)
+
+    if args.send:
+        progress = wait_for_delivery(job_id)
+    if progress['render_errors']:
+        print(f"⚠️  Some reports could not be generated; run again with --resume {job_id}")
+        return False
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_selection_arguments(parser)
+    parser.add_argument('--provider-email', help='send every report to this address instead of to each patient')
+    parser.add_argument('--resume', type=int, metavar='JOB_ID', help='finish an interrupted job')
+    parser.add_argument('--status', type=int, metavar='JOB_ID', help='show the progress of a job and exit')
+    parser.add_argument('--send', action='store_true', help='send the queued messages from this process and wait for them')
+    parser.add_argument('--workers', type=int, default=app.config['REPORT_EXPORT_WORKERS'], help='render processes (default: one per CPU)')
+    args = parser.parse_args()
+    # Render failures and sends are logged by app.py and outbox.py
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    sys.exit(0 if mail_reports(args) else 1)
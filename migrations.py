@@ -0,0 +1,425 @@
+"""
+Versioned schema migrations for the Patient Management System
+
+Each Migration has a version number and a list of steps. ``Migrator`` records
+the versions it has applied in the ``schema_version`` table and only runs the
+ones that are missing, in order. Every step checks the database before doing
+anything (a column that exists is not added again, an index that exists is not
+created again), so a migration interrupted half-way is simply run again, and
+a database created by ``db.create_all()`` gets its versions recorded without
+changing anything.
+
+Steps are written so they can run while the clinic is open:
+
+- columns are added without a default or NOT NULL, which MySQL 8 and SQLite
+  apply without rewriting the table (on MySQL the ALTER asks for
+  ``ALGORITHM=INPLACE, LOCK=NONE`` and fails rather than block writes);
+  the value for existing rows is then filled in by primary key ranges;
+- foreign keys are added in place after checking the existing rows;
+- data backfills run in batches of ``batch_size`` rows, each in its own short
+  transaction, pausing ``pause`` seconds between batches.
+
+``Migrator.run(dry_run=True)`` prints what each pending step would do.
+"""
+
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select
+from sqlalchemy.schema import CreateIndex as CreateIndexDDL
+
+from search import FULLTEXT_INDEX_NAME, FULLTEXT_INDEX_DDL
+
+schema_metadata = MetaData()
+schema_version = Table(
+    'schema_version', schema_metadata,
+    Column('version', Integer, primary_key=True, autoincrement=False),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False)
+)
+
+
+class Step:
+    """One idempotent change; ``needed`` says whether ``apply`` still has work to do"""
+
+    def describe(self):
+        raise NotImplementedError
+
+    def needed(self, migrator):
+        return True
+
+    def apply(self, migrator):
+        raise NotImplementedError
+
+
+class CreateTables(Step):
+    """Create the model tables that do not exist yet (existing tables are left alone)"""
+
+    def describe(self):
+        return "create missing tables"
+
+    def missing(self, migrator):
+        existing = set(inspect(migrator.engine).get_table_names())
+        return [table for table in migrator.db.metadata.sorted_tables if table.name not in existing]
+
+    def needed(self, migrator):
+        return bool(self.missing(migrator))
+
+    def apply(self, migrator):
+        tables = self.missing(migrator)
+        migrator.db.metadata.create_all(migrator.engine, tables=tables)
+        migrator.log(f"   created {', '.join(table.name for table in tables)}")
+
+
+class AddColumn(Step):
+    """Add a nullable column, then fill ``fill_value`` into existing rows in batches"""
+
+    def __init__(self, table, column, ddl, fill_value=None):
+        self.table = table
+        self.column = column
+        self.ddl = ddl
+        self.fill_value = fill_value
+
+    def describe(self):
+        text = f"ALTER TABLE {self.table} ADD COLUMN {self.column} {self.ddl}"
+        if self.fill_value is not None:
+            text += f", then set it to {self.fill_value!r} where NULL"
+        return text
+
+    def exists(self, migrator):
+        return self.column in {column['name'] for column in inspect(migrator.engine).get_columns(self.table)}
+
+    def needed(self, migrator):
+        if not migrator.has_table(self.table):
+            return False  # created complete by CreateTables
+        if not self.exists(migrator):
+            return True
+        return self.fill_value is not None and migrator.has_rows(
+            f"SELECT 1 FROM {self.table} WHERE {self.column} IS NULL LIMIT 1"
+        )
+
+    def apply(self, migrator):
+        if not self.exists(migrator):
+            statement = f"ALTER TABLE {self.table} ADD COLUMN {self.column} {self.ddl}"
+            if migrator.engine.dialect.name == 'mysql':
+                statement += ", ALGORITHM=INPLACE, LOCK=NONE"
+            with migrator.engine.begin() as connection:
+                connection.exec_driver_sql(statement)
+            migrator.log(f"   added {self.table}.{self.column}")
+        if self.fill_value is not None:
+            updated = migrator.update_by_id_ranges(
+                self.table,
+                f"UPDATE {self.table} SET {self.column} = :value "
+                f"WHERE id > :low AND id <= :high AND {self.column} IS NULL",
+                value=self.fill_value
+            )
+            migrator.log(f"   filled {updated} row(s) of {self.table}.{self.column}")
+
+
+class AddForeignKey(Step):
+    """Add the FOREIGN KEY constraint the models declare on ``table.column`` (MySQL only).
+
+    InnoDB accepts an inline ``REFERENCES`` in ADD COLUMN and then ignores it,
+    so on MySQL a column added by AddColumn has no constraint until this
+    step; SQLite creates it with the column. Existing rows are checked for
+    values with no referenced row first, then the constraint is added with
+    ``foreign_key_checks=0``, which is what lets MySQL use
+    ``ALGORITHM=INPLACE, LOCK=NONE`` instead of copying the table.
+    """
+
+    def __init__(self, table, column):
+        self.table = table
+        self.column = column
+
+    def foreign_key(self, migrator):
+        column = migrator.db.metadata.tables[self.table].c[self.column]
+        (foreign_key,) = column.foreign_keys
+        return foreign_key
+
+    def ddl(self, migrator):
+        foreign_key = self.foreign_key(migrator)
+        referred = foreign_key.column
+        return (f"ALTER TABLE {self.table} ADD CONSTRAINT {foreign_key.name} FOREIGN KEY ({self.column}) "
+                f"REFERENCES {referred.table.name}({referred.name})")
+
+    def describe(self):
+        return f"FOREIGN KEY {self.table}.{self.column}"
+
+    def exists(self, migrator):
+        return any(foreign_key['constrained_columns'] == [self.column]
+                   for foreign_key in inspect(migrator.engine).get_foreign_keys(self.table))
+
+    def needed(self, migrator):
+        if migrator.engine.dialect.name != 'mysql' or not migrator.has_table(self.table):
+            return False
+        return not self.exists(migrator)
+
+    def apply(self, migrator):
+        referred = self.foreign_key(migrator).column
+        orphans = migrator.has_rows(
+            f"SELECT 1 FROM {self.table} t WHERE t.{self.column} IS NOT NULL AND NOT EXISTS "
+            f"(SELECT 1 FROM {referred.table.name} r WHERE r.{referred.name} = t.{self.column}) LIMIT 1"
+        )
+        if orphans:
+            raise RuntimeError(f"{self.table}.{self.column} has values with no {referred.table.name} row; "
+                               f"set them to NULL before adding the foreign key")
+        with migrator.engine.connect() as connection:
+            connection.exec_driver_sql("SET SESSION foreign_key_checks = 0")
+            try:
+                connection.exec_driver_sql(f"{self.ddl(migrator)}, ALGORITHM=INPLACE, LOCK=NONE")
+            finally:
+                connection.exec_driver_sql("SET SESSION foreign_key_checks = 1")
+        if not self.exists(migrator):
+            raise RuntimeError(f"the foreign key on {self.table}.{self.column} was not created")
+        migrator.log(f"   added {self.foreign_key(migrator).name}")
+
+
+class CreateIndex(Step):
+    """Create an index declared on the models, by name"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def index(self, migrator):
+        for table in migrator.db.metadata.tables.values():
+            for index in table.indexes:
+                if index.name == self.name:
+                    return index
+        raise LookupError(f"no index named {self.name} on the models")
+
+    def describe(self):
+        return f"CREATE INDEX {self.name}"
+
+    def needed(self, migrator):
+        table = self.index(migrator).table.name
+        if not migrator.has_table(table):
+            return False  # created with its indexes by CreateTables
+        return self.name not in {index['name'] for index in inspect(migrator.engine).get_indexes(table)}
+
+    def apply(self, migrator):
+        statement = str(CreateIndexDDL(self.index(migrator)).compile(dialect=migrator.engine.dialect))
+        if migrator.engine.dialect.name == 'mysql':
+            statement += " ALGORITHM=INPLACE LOCK=NONE"
+        with migrator.engine.begin() as connection:
+            connection.exec_driver_sql(statement)
+        migrator.log(f"   created {self.name}")
+
+
+class CreateFulltextIndex(Step):
+    """The ngram FULLTEXT index of the 'fulltext' search backend (MySQL only)"""
+
+    def describe(self):
+        return FULLTEXT_INDEX_DDL
+
+    def needed(self, migrator):
+        if migrator.engine.dialect.name != 'mysql':
+            return False
+        return FULLTEXT_INDEX_NAME not in {index['name'] for index in inspect(migrator.engine).get_indexes('patient')}
+
+    def apply(self, migrator):
+        with migrator.engine.begin() as connection:
+            connection.exec_driver_sql(FULLTEXT_INDEX_DDL)
+        migrator.log(f"   created {FULLTEXT_INDEX_NAME}")
+
+
+class Backfill(Step):
+    """Data change done by ``function(migrator)``, which works in throttled batches"""
+
+    def __init__(self, description, function, needed):
+        self.description = description
+        self.function = function
+        self.check = needed
+
+    def describe(self):
+        return self.description
+
+    def needed(self, migrator):
+        return self.check(migrator)
+
+    def apply(self, migrator):
+        self.function(migrator)
+
+
+class Migration:
+    def __init__(self, version, description, steps):
+        self.version = version
+        self.description = description
+        self.steps = steps
+
+
+AUTO_PRESCRIPTION = "Basado en el diagnóstico: %"
+
+
+def unlinked_prescriptions_exist(migrator):
+    if not migrator.has_table('prescription'):
+        return False
+    # Before diagnosis_id is added (dry run) every auto-generated prescription is unlinked
+    columns = {column['name'] for column in inspect(migrator.engine).get_columns('prescription')}
+    unlinked = "diagnosis_id IS NULL AND " if 'diagnosis_id' in columns else ""
+    return migrator.has_rows(
+        f"SELECT 1 FROM prescription WHERE {unlinked}instructions LIKE :marker LIMIT 1",
+        marker=AUTO_PRESCRIPTION
+    )
+
+
+def backfill_prescription_diagnoses(migrator):
+    """Link prescriptions generated before diagnosis_id existed to their diagnosis.
+
+    Walks the unlinked auto-generated prescriptions by id. Each is linked to
+    the diagnosis of the same patient with the same diagnosis text and
+    treatment plan (what the diagnosis form copied into it), the closest in
+    creation time if there are several; a diagnosis gets at most one
+    prescription. Prescriptions written by hand are left unlinked.
+    """
+    prescription = migrator.db.metadata.tables['prescription']
+    diagnosis = migrator.db.metadata.tables['diagnosis']
+    linked = 0
+    last_id = 0
+    while True:
+        with migrator.engine.begin() as connection:
+            batch = connection.execute(
+                select(prescription.c.id, prescription.c.patient_id, prescription.c.diagnosis,
+                       prescription.c.medications, prescription.c.created_at)
+                .where(prescription.c.id > last_id,
+                       prescription.c.diagnosis_id.is_(None),
+                       prescription.c.instructions.like(AUTO_PRESCRIPTION))
+                .order_by(prescription.c.id)
+                .limit(migrator.batch_size)
+            ).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            # Diagnoses of these patients that could still own a prescription
+            linked_ids = select(prescription.c.diagnosis_id).where(prescription.c.diagnosis_id.is_not(None))
+            candidates = defaultdict(list)
+            for row in connection.execute(
+                select(diagnosis.c.id, diagnosis.c.patient_id, diagnosis.c.diagnosis,
+                       diagnosis.c.treatment_plan, diagnosis.c.created_at)
+                .where(diagnosis.c.patient_id.in_({row.patient_id for row in batch}),
+                       diagnosis.c.treatment_plan.is_not(None),
+                       diagnosis.c.id.not_in(linked_ids))
+            ):
+                candidates[(row.patient_id, row.diagnosis, row.treatment_plan.strip())].append(row)
+
+            for row in batch:
+                options = candidates.get((row.patient_id, row.diagnosis, row.medications))
+                if not options:
+                    continue
+                match = min(options, key=lambda option: abs((option.created_at - row.created_at).total_seconds())
+                            if option.created_at and row.created_at else float('inf'))
+                options.remove(match)
+                connection.execute(
+                    prescription.update().where(prescription.c.id == row.id).values(diagnosis_id=match.id)
+                )
+                linked += 1
+        time.sleep(migrator.pause)
+
+    migrator.log(f"   linked {linked} prescription(s) to the diagnosis they were generated from")
+
+
+MIGRATIONS = [
+    Migration(1, "Create the application tables", [CreateTables()]),
+    Migration(2, "Record the professional license on diagnoses and prescriptions", [
+        AddColumn('diagnosis', 'professional_license', 'VARCHAR(50)', fill_value='12345678'),
+        AddColumn('prescription', 'professional_license', 'VARCHAR(50)', fill_value='12345678'),
+    ]),
+    Migration(3, "Indexes for the payments ledger and the email outbox", [
+        CreateIndex('ix_payment_payment_date'),
+        CreateIndex('ix_payment_status_payment_date'),
+        CreateIndex('ix_email_outbox_status_next_attempt_at'),
+    ]),
+    Migration(4, "FULLTEXT index for patient search", [CreateFulltextIndex()]),
+    Migration(5, "Link outbox messages to their bulk mail job", [
+        AddColumn('email_outbox', 'job_id', 'INTEGER REFERENCES mail_jobs(id)'),
+        CreateIndex('uq_email_outbox_job_patient'),
+    ]),
+    Migration(6, "Link auto-generated prescriptions to their diagnosis", [
+        AddColumn('prescription', 'diagnosis_id', 'INTEGER REFERENCES diagnosis(id)'),
+        CreateIndex('ix_prescription_diagnosis_id'),
+        Backfill("link existing auto-generated prescriptions to their diagnosis",
+                 backfill_prescription_diagnoses, unlinked_prescriptions_exist),
+    ]),
+    Migration(7, "Indexes for the per-patient and listing queries", [
+        CreateIndex('ix_patient_created_at_id'),
+        CreateIndex('ix_disease_patient_id'),
+        CreateIndex('ix_medication_patient_id'),
+        CreateIndex('ix_prescription_patient_id_date'),
+        CreateIndex('ix_diagnosis_patient_id_date'),
+        CreateIndex('ix_payment_patient_id_payment_date'),
+    ]),
+    # Migration 6 added the column without it on MySQL
+    Migration(8, "Foreign key from prescriptions to their diagnosis", [
+        AddForeignKey('prescription', 'diagnosis_id'),
+    ]),
+    # Migration 5 added the column without it on MySQL
+    Migration(9, "Foreign key from outbox messages to their bulk mail job", [
+        AddForeignKey('email_outbox', 'job_id'),
+    ]),
+]
+
+
+class Migrator:
+    """Applies the pending ``migrations`` to ``db`` and records them in schema_version"""
+
+    def __init__(self, db, migrations=MIGRATIONS, batch_size=1000, pause=0.1, log=print):
+        self.db = db
+        self.engine = db.engine
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.batch_size = batch_size
+        self.pause = pause
+        self.log = log
+
+    def applied(self):
+        """``{version: applied_at}`` of the migrations already run"""
+        if not inspect(self.engine).has_table('schema_version'):
+            return {}
+        with self.engine.connect() as connection:
+            return dict(connection.execute(select(schema_version.c.version, schema_version.c.applied_at)).all())
+
+    def pending(self):
+        applied = self.applied()
+        return [migration for migration in self.migrations if migration.version not in applied]
+
+    def has_table(self, name):
+        return inspect(self.engine).has_table(name)
+
+    def has_rows(self, sql, **params):
+        with self.engine.connect() as connection:
+            return connection.execute(self.db.text(sql), params).first() is not None
+
+    def update_by_id_ranges(self, table, sql, **params):
+        """Run ``sql`` for consecutive ``:low``-``:high`` id ranges, one short transaction each"""
+        with self.engine.connect() as connection:
+            max_id = connection.exec_driver_sql(f"SELECT MAX(id) FROM {table}").scalar() or 0
+        updated = 0
+        for low in range(0, max_id, self.batch_size):
+            with self.engine.begin() as connection:
+                result = connection.execute(self.db.text(sql), dict(params, low=low, high=low + self.batch_size))
+                updated += result.rowcount
+            time.sleep(self.pause)
+        return updated
+
+    def run(self, dry_run=False):
+        """Apply (or with ``dry_run`` only describe) the pending migrations; returns them"""
+        pending = self.pending()
+        if not dry_run:
+            schema_metadata.create_all(self.engine)
+        for migration in pending:
+            self.log(f"{'🔍' if dry_run else '🔧'} {migration.version}: {migration.description}")
+            for step in migration.steps:
+                if not step.needed(self):
+                    self.log(f"   ✓ {step.describe()} (nothing to do)")
+                    continue
+                if dry_run:
+                    self.log(f"   → {step.describe()}")
+                    continue
+                self.log(f"   → {step.describe()}")
+                step.apply(self)
+            if not dry_run:
+                with self.engine.begin() as connection:
+                    connection.execute(schema_version.insert().values(
+                        version=migration.version, description=migration.description, applied_at=datetime.utcnow()
+                    ))
+        return pending
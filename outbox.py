@@ -0,0 +1,284 @@
+"""
+Persistent outbox for outgoing email
+
+Routes never talk to the SMTP server: they store the message in the
+``email_outbox`` table and return. An OutboxWorker thread in each web process
+(or the ``send_outbox.py`` script) claims the messages that are due, sends
+them and records the outcome on the row, which is what the status pages show.
+
+A failed send is retried with exponential backoff until ``max_attempts``.
+Messages to a recipient domain with a rate limit (e.g. gmail.com) are spaced
+out: one that would exceed it is pushed back without using an attempt.
+Messages are claimed with a conditional UPDATE, so several processes can
+work on the same outbox without sending anything twice; a claim that is
+never resolved (the process died mid-send) expires after ``lease`` seconds
+and the message is tried again.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+SENDING = 'sending'
+SENT = 'sent'
+FAILED = 'failed'
+STATUSES = (QUEUED, SENDING, SENT, FAILED)
+
+
+def retry_delay(attempts, base=30, cap=3600):
+    """Seconds before the next try after ``attempts`` failures: doubling, capped, with jitter"""
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def is_permanent_failure(error):
+    """SMTP errors that retrying cannot fix, e.g. every recipient was refused"""
+    import smtplib
+    return isinstance(error, smtplib.SMTPRecipientsRefused)
+
+
+def compose_message(sender, recipient, subject, body, attachment=None, attachment_name=None):
+    """MIME message with a plain text body and an optional PDF attachment"""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from email.mime.application import MIMEApplication
+
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    if attachment is not None:
+        part = MIMEApplication(attachment, _subtype='pdf')
+        part.add_header('Content-Disposition', 'attachment', filename=attachment_name)
+        msg.attach(part)
+    return msg
+
+
+def recipient_domain(recipient):
+    return recipient.rsplit('@', 1)[-1].strip().lower()
+
+
+class DomainRateLimiter:
+    """At most ``limits[domain]`` messages per minute to each recipient domain.
+
+    Messages are spaced evenly rather than sent in bursts. ``default`` applies
+    to domains not listed (None: no limit). Limits hold per process.
+    """
+
+    def __init__(self, limits=None, default=None):
+        self.limits = {domain.lower(): per_minute for domain, per_minute in (limits or {}).items()}
+        self.default = default
+        self.next_slot = {}
+        self.lock = threading.Lock()
+
+    def interval(self, domain):
+        """Seconds between two messages to ``domain``; 0 when it is not limited"""
+        per_minute = self.limits.get(domain, self.default)
+        return 60.0 / per_minute if per_minute else 0
+
+    def reserve(self, domain):
+        """0 and the slot is taken if a message to ``domain`` may go now, else seconds until it may"""
+        interval = self.interval(domain)
+        if not interval:
+            return 0
+        now = time.monotonic()
+        with self.lock:
+            slot = max(self.next_slot.get(domain, now), now)
+            if slot > now:
+                return slot - now
+            self.next_slot[domain] = now + interval
+            return 0
+
+
+class Outbox:
+    """Queue of outgoing messages stored in ``model``, delivered by ``send(message)``"""
+
+    def __init__(self, db, model, send, max_attempts=8, base_delay=30, max_delay=3600, lease=300,
+                 rate_limiter=None):
+        self.db = db
+        self.model = model
+        self.send = send
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = lease
+        self.rate_limiter = rate_limiter
+
+    def enqueue(self, **fields):
+        """Store a message, due now, and commit; returns the new row"""
+        message = self.model(status=QUEUED, attempts=0, next_attempt_at=datetime.utcnow(), **fields)
+        self.db.session.add(message)
+        self.db.session.commit()
+        return message
+
+    def _due(self, now):
+        model = self.model
+        return self.db.or_(
+            self.db.and_(model.status == QUEUED, model.next_attempt_at <= now),
+            self.db.and_(model.status == SENDING, model.claimed_at < now - timedelta(seconds=self.lease))
+        )
+
+    def claim(self, limit=20):
+        """Mark up to ``limit`` due messages as being sent by this process and return their ids"""
+        db, model = self.db, self.model
+        now = datetime.utcnow()
+        candidates = db.session.execute(
+            db.select(model.id, model.recipient).where(self._due(now)).order_by(model.next_attempt_at).limit(limit)
+        ).all()
+        claimed = []
+        deferred = {}
+        for message_id, recipient in candidates:
+            if self.rate_limiter is not None:
+                domain = recipient_domain(recipient)
+                wait = self.rate_limiter.reserve(domain)
+                if wait:
+                    # Over the domain's rate: due again once its turn comes, without using an attempt
+                    wait += deferred.get(domain, 0) * self.rate_limiter.interval(domain)
+                    deferred[domain] = deferred.get(domain, 0) + 1
+                    db.session.execute(
+                        db.update(model)
+                        .where(model.id == message_id, self._due(now))
+                        .values(status=QUEUED, next_attempt_at=now + timedelta(seconds=wait))
+                    )
+                    continue
+            # Only one process can move a given row out of the due state
+            result = db.session.execute(
+                db.update(model)
+                .where(model.id == message_id, self._due(now))
+                .values(status=SENDING, claimed_at=now, attempts=model.attempts + 1)
+            )
+            if result.rowcount == 1:
+                claimed.append(message_id)
+        db.session.commit()
+        return claimed
+
+    def deliver(self, message_id):
+        """Send one claimed message and record the outcome; True if it was sent"""
+        db = self.db
+        message = db.session.get(self.model, message_id)
+        try:
+            self.send(message)
+        except Exception as e:
+            message.last_error = f"{type(e).__name__}: {e}"[:500]
+            if message.attempts >= self.max_attempts or is_permanent_failure(e):
+                message.status = FAILED
+            else:
+                message.status = QUEUED
+                message.next_attempt_at = datetime.utcnow() + timedelta(
+                    seconds=retry_delay(message.attempts, self.base_delay, self.max_delay))
+            db.session.commit()
+            logger.warning('Email %s to %s failed (attempt %s): %s',
+                           message.id, message.recipient, message.attempts, message.last_error)
+            return False
+        message.status = SENT
+        message.sent_at = datetime.utcnow()
+        message.last_error = None
+        db.session.commit()
+        return True
+
+    def seconds_until_due(self):
+        """Seconds until the next queued message is due (0 if one is), or None if none is queued"""
+        db, model = self.db, self.model
+        next_at = db.session.execute(
+            db.select(db.func.min(model.next_attempt_at)).where(model.status == QUEUED)
+        ).scalar()
+        if next_at is None:
+            return None
+        return max((next_at - datetime.utcnow()).total_seconds(), 0)
+
+    def retry(self, message_id):
+        """Queue a failed message again, due now, with a fresh set of attempts"""
+        message = self.db.session.get(self.model, message_id)
+        if message is None or message.status != FAILED:
+            return False
+        message.status = QUEUED
+        message.attempts = 0
+        message.next_attempt_at = datetime.utcnow()
+        self.db.session.commit()
+        return True
+
+
+class OutboxWorker:
+    """Daemon thread draining an outbox inside ``app.app_context()``.
+
+    It wakes up every ``poll_interval`` seconds, or right away when ``wake()``
+    is called after an enqueue, and keeps going while full batches come back.
+    Up to ``concurrency`` messages of a batch are sent at the same time.
+    """
+
+    def __init__(self, app, outbox, poll_interval=15, batch_size=10, concurrency=1):
+        self.app = app
+        self.outbox = outbox
+        self.poll_interval = poll_interval
+        self.concurrency = concurrency
+        self.batch_size = max(batch_size, concurrency)
+        self.executor = None
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.thread = None
+        self.stopping = False
+
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='email-outbox', daemon=True)
+                self.thread.start()
+
+    def wake(self):
+        self.start()
+        self.event.set()
+
+    def stop(self):
+        self.stopping = True
+        self.event.set()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def _deliver(self, message_id):
+        with self.app.app_context():
+            self.outbox.deliver(message_id)
+
+    def drain(self):
+        """Process batches until nothing is due; returns how many messages were claimed"""
+        total = 0
+        while not self.stopping:
+            with self.app.app_context():
+                claimed = self.outbox.claim(self.batch_size)
+            if self.concurrency > 1 and len(claimed) > 1:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='email-send')
+                list(self.executor.map(self._deliver, claimed))
+            else:
+                for message_id in claimed:
+                    self._deliver(message_id)
+            total += len(claimed)
+            if len(claimed) < self.batch_size:
+                return total
+        return total
+
+    def run(self):
+        """Poll and send until stop(); the body of the worker thread"""
+        while not self.stopping:
+            # Cleared before draining, so a wake() during the run is not lost
+            self.event.clear()
+            timeout = self.poll_interval
+            try:
+                self.drain()
+                with self.app.app_context():
+                    due_in = self.outbox.seconds_until_due()
+                # Retries and rate-limited messages may be due before the next poll
+                if due_in is not None:
+                    timeout = min(timeout, max(due_in, 0.05))
+            except Exception:
+                # Database unavailable or similar: try again on the next poll
+                logger.exception('Email outbox run failed')
+            self.event.wait(timeout=timeout)
@@ -0,0 +1,117 @@
+"""
+Keyset (cursor) pagination helpers for the Patient Management System
+
+Pages are addressed by the sort key of their first/last row instead of an
+OFFSET, so fetching page N costs the same index range scan as page 1.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+
+class KeysetPage:
+    """One page of results plus the cursors to move around it"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        raise ValueError('Unknown cursor value')
+    return value
+
+
+def encode_cursor(values):
+    """Serialize sort key values into an opaque, URL-safe cursor"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Parse a cursor produced by encode_cursor; raises ValueError if invalid"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid cursor: {e}')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return [_decode_value(v) for v in values]
+
+
+def _keyset_predicate(columns, values, older):
+    """Row-value comparison expanded into OR/AND terms.
+
+    For ``(a, b) < (x, y)`` this builds ``a < x OR (a = x AND b < y)``, which
+    every backend can drive from a composite index on ``(a, b)``.
+    """
+    terms = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        compare = column < values[i] if older else column > values[i]
+        terms.append(and_(*equal, compare))
+    return or_(*terms)
+
+
+def keyset_paginate(query, columns, per_page, after=None, before=None):
+    """Paginate ``query`` newest-first on ``columns`` (all sorted descending).
+
+    ``after`` is the cursor of the last row of the previous page (move to
+    older rows) and ``before`` the cursor of the first row of the next page
+    (move back to newer rows). The last column must be unique, e.g. the
+    primary key, so the ordering is total.
+    """
+    if before:
+        values = decode_cursor(before, len(columns))
+        rows = (query.filter(_keyset_predicate(columns, values, older=False))
+                .order_by(*[c.asc() for c in columns])
+                .limit(per_page + 1)
+                .all())
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if after:
+            values = decode_cursor(after, len(columns))
+            query = query.filter(_keyset_predicate(columns, values, older=True))
+        rows = query.order_by(*[c.desc() for c in columns]).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = after is not None
+
+    def cursor_for(item):
+        return encode_cursor([getattr(item, c.key) for c in columns])
+
+    return KeysetPage(
+        items,
+        per_page,
+        next_cursor=cursor_for(items[-1]) if items and has_next else None,
+        prev_cursor=cursor_for(items[0]) if items and has_prev else None
+    )
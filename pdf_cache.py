@@ -0,0 +1,192 @@
+"""
+Content-addressed cache of generated PDF documents
+
+A document is identified by what it was built from: its kind, the record it
+renders, the patient it belongs to and a version tuple (timestamps of the
+rows involved plus the template version). The version is hashed into the
+cache key, so an edit simply produces a new key and a stale PDF can never be
+served; ``invalidate(patient_id)`` additionally drops a patient's entries
+early so they do not wait for LRU eviction.
+
+Two tiers are kept, both bounded by size with least-recently-used eviction:
+
+- memory: per process, serves repeat downloads with no I/O at all
+- disk: shared by all worker processes and kept across restarts; only used
+  when a ``directory`` is given, as the files hold patient data unencrypted
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class PdfCache:
+    """Two-tier (memory, then disk) LRU cache of PDF bytes"""
+
+    SUFFIX = '.pdf'
+
+    def __init__(self, directory=None, memory_bytes=16 * 1024 * 1024, disk_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.disk = OrderedDict()  # file name -> size, least recently used first
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        self.build_locks = {}
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._scan()
+
+    @staticmethod
+    def key(kind, record_id, patient_id, version):
+        """Cache key (also the file name) for a document built from ``version``"""
+        digest = hashlib.sha256(repr((kind, record_id, patient_id, version)).encode()).hexdigest()[:24]
+        return f"p{patient_id}-{kind}{record_id}-{digest}{PdfCache.SUFFIX}"
+
+    def get(self, key):
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return data
+        if not self.directory:
+            return None
+        # Not indexed does not mean absent: another worker may have written it
+        data = self._read(key)
+        if data is None:
+            return None
+        with self.lock:
+            self.stats['disk_hits'] += 1
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        with self.lock:
+            self._remember(key, data)
+        if self.directory:
+            self._write(key, data)
+
+    def get_or_build(self, key, build):
+        """Cached bytes for ``key``, calling ``build()`` at most once per key at a time"""
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self.lock:
+            build_lock = self.build_locks.setdefault(key, threading.Lock())
+        try:
+            with build_lock:
+                data = self.get(key)
+                if data is None:
+                    with self.lock:
+                        self.stats['misses'] += 1
+                    data = build()
+                    self.put(key, data)
+        finally:
+            with self.lock:
+                self.build_locks.pop(key, None)
+        return data
+
+    def invalidate(self, patient_id):
+        """Drop every cached document of a patient from both tiers"""
+        prefix = f"p{patient_id}-"
+        with self.lock:
+            for key in [k for k in self.memory if k.startswith(prefix)]:
+                self.memory_size -= len(self.memory.pop(key))
+            doomed = {k for k in self.disk if k.startswith(prefix)}
+            for key in doomed:
+                self.disk_size -= self.disk.pop(key)
+        if not self.directory:
+            return
+        # Including files other workers wrote since this one last looked
+        doomed.update(entry.name for entry in os.scandir(self.directory) if entry.name.startswith(prefix))
+        for key in doomed:
+            self._unlink(key)
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_size = 0
+            doomed = list(self.disk)
+            self.disk.clear()
+            self.disk_size = 0
+        for key in doomed:
+            self._unlink(key)
+
+    def _remember(self, key, data):
+        if key in self.memory:
+            self.memory_size -= len(self.memory.pop(key))
+        if len(data) > self.memory_bytes:
+            return
+        self.memory[key] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.memory_bytes:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_size -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        """Index the files left by earlier runs or other workers, oldest access first"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self.disk[name] = size
+            self.disk_size += size
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))  # mtime doubles as last access for _scan
+        except FileNotFoundError:
+            # Evicted by another worker
+            with self.lock:
+                size = self.disk.pop(key, None)
+                if size is not None:
+                    self.disk_size -= size
+            return None
+        with self.lock:
+            if key in self.disk:
+                self.disk.move_to_end(key)
+            else:
+                self.disk[key] = len(data)
+                self.disk_size += len(data)
+        return data
+
+    def _write(self, key, data):
+        if len(data) > self.disk_bytes:
+            return
+        # Write then rename, so readers in other workers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        doomed = []
+        with self.lock:
+            if key in self.disk:
+                self.disk_size -= self.disk.pop(key)
+            self.disk[key] = len(data)
+            self.disk_size += len(data)
+            while self.disk_size > self.disk_bytes:
+                evicted, size = self.disk.popitem(last=False)
+                self.disk_size -= size
+                self.stats['evictions'] += 1
+                doomed.append(evicted)
+        for evicted in doomed:
+            self._unlink(evicted)
+
+    def _unlink(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,104 @@
+"""
+Shared ReportLab styles for the PDF documents of the Patient Management System
+
+``getSampleStyleSheet()`` builds a whole stylesheet, and every PDF route used
+to call it and then derive the same ParagraphStyle and TableStyle objects
+again for each document. The styles are immutable once built, so they are
+now created once per process, on first use, and shared by every document.
+reportlab itself is only imported at that point.
+"""
+
+from functools import lru_cache
+
+# Header font sizes of the grey/beige data tables used by the patient report
+DATA_TABLE_HEADER_SIZES = (12, 10, 8)
+
+
+class PdfStyles:
+    """Paragraph and table styles shared by all PDF builders"""
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+        self.colors = colors
+        self.base = getSampleStyleSheet()
+        base = self.base
+
+        # Patient report
+        self.report_title = ParagraphStyle(
+            'CustomTitle',
+            parent=base['Heading1'],
+            fontSize=16,
+            spaceAfter=30,
+            alignment=1
+        )
+        self.heading = base['Heading2']
+
+        # Prescription and diagnosis documents
+        self.document_title = ParagraphStyle(
+            'Title',
+            parent=base['Title'],
+            fontSize=18,
+            alignment=1,  # Center
+            spaceAfter=30,
+            textColor=colors.darkblue
+        )
+        self.section = ParagraphStyle(
+            'Section',
+            parent=base['Heading2'],
+            fontSize=12,
+            spaceAfter=10,
+            textColor=colors.darkblue
+        )
+        self.info = ParagraphStyle(
+            'Info',
+            parent=base['Normal'],
+            fontSize=10,
+            spaceAfter=5
+        )
+        self.clinic_info = ParagraphStyle(
+            'ClinicInfo',
+            parent=base['Normal'],
+            fontSize=10,
+            alignment=2,  # Right alignment
+            spaceAfter=5,
+            textColor=colors.grey
+        )
+        self.footer = ParagraphStyle(
+            'Footer',
+            parent=base['Normal'],
+            fontSize=8,
+            alignment=1,
+            textColor=colors.grey
+        )
+
+        self.data_tables = {size: self._data_table_style(size) for size in DATA_TABLE_HEADER_SIZES}
+
+    def _data_table_style(self, header_font_size):
+        from reportlab.platypus import TableStyle
+
+        colors = self.colors
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), header_font_size),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ])
+
+    def data_table(self, header_font_size=12):
+        """Grey header, beige body table style; Table.setStyle only reads it"""
+        style = self.data_tables.get(header_font_size)
+        if style is None:
+            style = self.data_tables.setdefault(header_font_size, self._data_table_style(header_font_size))
+        return style
+
+
+@lru_cache(maxsize=None)
+def get_pdf_styles():
+    """The process-wide PdfStyles, built on first call"""
+    return PdfStyles()
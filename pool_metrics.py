@@ -0,0 +1,88 @@
+"""
+Database connection pool metrics
+
+PoolMetrics listens to an engine's pool events and counts connections opened,
+checkouts, invalidations (connections found dead by pre-ping or dropped on
+error) and checkouts that timed out waiting for a free connection. It also
+records how long connections stay checked out: requests that hold one for a
+long time are what make a pool run dry. ``snapshot()`` adds the pool's own
+view (size, in use, overflow) for the ``/api/db-pool`` endpoint.
+"""
+
+import threading
+import time
+
+from sqlalchemy import event
+
+
+class PoolMetrics:
+    def __init__(self, engine):
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.checked_out = {}  # id(connection record) -> monotonic checkout time
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.held_seconds = 0.0
+        self.max_held_seconds = 0.0
+        event.listen(engine, 'connect', self.on_connect)
+        event.listen(engine, 'checkout', self.on_checkout)
+        event.listen(engine, 'checkin', self.on_checkin)
+        event.listen(engine, 'invalidate', self.on_invalidate)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self.lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self.lock:
+            # Keyed by the record: its info dict is cleared when the connection is invalidated
+            self.checked_out[id(connection_record)] = time.monotonic()
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self.lock:
+            checked_out_at = self.checked_out.pop(id(connection_record), None)
+            if checked_out_at is None:
+                return
+            held = time.monotonic() - checked_out_at
+            self.in_use -= 1
+            self.held_seconds += held
+            self.max_held_seconds = max(self.max_held_seconds, held)
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self.lock:
+            self.invalidations += 1
+
+    def record_timeout(self):
+        """Count a request that gave up waiting for a connection (pool_timeout)"""
+        with self.lock:
+            self.timeouts += 1
+
+    def snapshot(self):
+        pool = self.engine.pool
+        with self.lock:
+            checkins = self.checkouts - self.in_use
+            stats = {
+                'pool': type(pool).__name__,
+                'since': self.started,
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'in_use': self.in_use,
+                'peak_in_use': self.peak_in_use,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'avg_held_ms': round(self.held_seconds / checkins * 1000, 2) if checkins else 0.0,
+                'max_held_ms': round(self.max_held_seconds * 1000, 2)
+            }
+        # QueuePool's own counters; other pools (in-memory SQLite) do not have them
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, name):
+                stats[f'pool_{name}'] = getattr(pool, name)()
+        return stats
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Dashboard Counters Reconcile Script for Patient Management System
+Rebuilds the dashboard_counters table from scratch and reports any drift
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, reconcile_dashboard_counters
+
+def reconcile_counters():
+    """Recompute every dashboard counter and report the ones that drifted"""
+    with app.app_context():
+        try:
+            # Make sure the counters table exists before rebuilding it
+            db.create_all()
+            drift = reconcile_dashboard_counters()
+
+            if not drift:
+                print("✅ Dashboard counters are in sync")
+                return True
+
+            print(f"⚠️  {len(drift)} dashboard counter(s) drifted and were rebuilt:")
+            for name, (stored, actual) in drift.items():
+                stored_text = 'missing' if stored is None else f"{stored:.2f}"
+                print(f"   - {name}: stored={stored_text} actual={actual:.2f}")
+
+        except Exception as e:
+            print(f"❌ Error reconciling dashboard counters: {e}")
+            return False
+
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if reconcile_counters() else 1)
@@ -0,0 +1,185 @@
+"""
+Read replica routing for the Patient Management System
+
+With SQLALCHEMY_BINDS['replica'] configured, GET requests to routes marked
+``@read_only`` run their SELECTs on the replica; everything else (writes,
+SELECT ... FOR UPDATE, raw SQL, background threads, other routes) uses the
+primary. One tolerance, ``REPLICA_MAX_LAG`` seconds, keeps reads consistent:
+
+- the replica is only used while the lag it reports is within the tolerance
+  (checked every ``REPLICA_CHECK_INTERVAL`` seconds per process; a replica
+  that cannot be reached or whose replication stopped is skipped);
+- a client that wrote something reads from the primary for the next
+  ``REPLICA_MAX_LAG`` seconds (a timestamp in its Flask session), so it sees
+  its own writes even before they reach the replica. After that, a replica
+  within tolerance has them too.
+
+A request that writes switches to the primary for the rest of the request.
+Work outside requests reads from the primary unless it calls
+``prefer_replica()``, as the analytics snapshot refresh does.
+A replica that reports no replication status (SQLite, or a MySQL server that
+is not a replica) is taken as current; this is what allows trying the
+routing locally with two database files.
+"""
+
+import functools
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request, session as client_session
+from flask_sqlalchemy.session import Session
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = 'replica'
+WRITTEN_AT = 'db_written_at'
+
+
+def replica_lag(connection):
+    """Seconds the replica is behind, None when it reports no replication status, inf when replication stopped"""
+    if connection.dialect.name != 'mysql':
+        return None
+    try:
+        row = connection.exec_driver_sql('SHOW REPLICA STATUS').mappings().first()
+        lag = row and row.get('Seconds_Behind_Source')
+    except Exception:
+        # Before MySQL 8.0.22
+        row = connection.exec_driver_sql('SHOW SLAVE STATUS').mappings().first()
+        lag = row and row.get('Seconds_Behind_Master')
+    if row is None:
+        return None
+    return float('inf') if lag is None else float(lag)
+
+
+class ReadReplica:
+    """Decides, per process and at most every ``check_interval`` seconds, whether the replica can serve reads
+
+    Until the first check finishes the replica counts as unusable, so reads
+    start on the primary.
+    """
+
+    def __init__(self, engine, max_lag=5, check_interval=5):
+        self.engine = engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.checking = False
+        self.checked_at = None
+        self.lag = None
+        self.healthy = False
+        self.error = None
+        self.reads = 0
+
+    def check(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.exec_driver_sql('SELECT 1')
+                lag = replica_lag(connection)
+        except Exception as e:
+            if self.healthy or self.checked_at is None:
+                logger.warning("Read replica unavailable, reading from the primary: %s", e)
+            self.lag, self.healthy, self.error = None, False, str(e)
+        else:
+            healthy = lag is None or lag <= self.max_lag
+            if self.healthy and not healthy:
+                logger.warning("Read replica is %.0f s behind, reading from the primary", lag)
+            self.lag, self.healthy, self.error = lag, healthy, None
+        self.checked_at = time.monotonic()
+
+    def due(self):
+        return self.checked_at is None or time.monotonic() - self.checked_at >= self.check_interval
+
+    def usable(self):
+        """Last known health; one caller at a time runs a due check while the others carry on"""
+        if self.due():
+            with self.lock:
+                refresh = not self.checking and self.due()
+                self.checking = self.checking or refresh
+            if refresh:
+                # Outside the lock: an unreachable replica only delays this request (connect_timeout)
+                try:
+                    self.check()
+                finally:
+                    self.checking = False
+        return self.healthy
+
+    def status(self):
+        return {
+            'healthy': self.healthy,
+            'lag': self.lag,
+            'max_lag': self.max_lag,
+            'error': self.error,
+            'reads': self.reads
+        }
+
+
+def recently_wrote(max_lag):
+    written_at = client_session.get(WRITTEN_AT)
+    return written_at is not None and time.time() - written_at < max_lag
+
+
+def read_only(view):
+    """Let a route's GET requests read from the replica"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        replica = current_app.extensions.get('read_replica')
+        g.use_replica = (
+            replica is not None
+            and request.method == 'GET'
+            and not recently_wrote(replica.max_lag)
+            and replica.usable()
+        )
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def prefer_replica():
+    """Let the current app context (e.g. a background job) read from the replica, if usable"""
+    replica = current_app.extensions.get('read_replica')
+    g.use_replica = replica is not None and replica.usable()
+
+
+def use_primary():
+    """Read from the primary from now on, e.g. before reading rows that are going to be written"""
+    if has_app_context():
+        g.use_replica = False
+
+
+def mark_written():
+    """The rest of the request, and the client for ``max_lag`` seconds, read from the primary"""
+    use_primary()
+    if has_request_context():
+        replica = current_app.extensions.get('read_replica')
+        if replica is not None:
+            client_session[WRITTEN_AT] = time.time()
+
+
+def record_write(session, flush_context):
+    """after_flush listener for the ORM's writes"""
+    mark_written()
+
+
+def is_plain_read(clause):
+    """An ORM or Core SELECT without FOR UPDATE (text() statements are not inspected)"""
+    return (
+        clause is not None
+        and getattr(clause, 'is_select', False)
+        and getattr(clause, '_for_update_arg', None) is None
+    )
+
+
+class RoutingSession(Session):
+    """Session that sends the SELECTs of replica-enabled requests and jobs to the replica bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if getattr(clause, 'is_dml', False):
+            # Core INSERT/UPDATE/DELETE run with session.execute() do not flush
+            mark_written()
+        elif (bind is None and not self._flushing and has_app_context()
+                and g.get('use_replica') and is_plain_read(clause)):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                current_app.extensions['read_replica'].reads += 1
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
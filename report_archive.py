@@ -0,0 +1,50 @@
+"""
+Optional on-disk archive of emailed patient reports
+
+Reports are built and sent from memory. When ``REPORT_ARCHIVE_DIR`` is set,
+a copy of every emailed report is also kept there, and files older than the
+retention period are deleted each time a new one is saved.
+"""
+
+import os
+import tempfile
+import time
+
+
+class ReportArchive:
+    """Directory of archived PDFs with age- and count-based retention"""
+
+    def __init__(self, directory, retention_days=30, max_files=None):
+        self.directory = directory
+        self.retention_days = retention_days
+        self.max_files = max_files
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, filename, data):
+        """Write ``data`` as ``filename`` (atomically), prune old files and return the path"""
+        path = os.path.join(self.directory, os.path.basename(filename))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.prune()
+        return path
+
+    def prune(self):
+        """Delete archived files past the retention period or over ``max_files``; returns how many"""
+        cutoff = time.time() - self.retention_days * 24 * 3600
+        files = sorted(
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(self.directory)
+            if entry.is_file() and entry.name.endswith('.pdf')
+        )
+        doomed = [path for mtime, path in files if mtime < cutoff]
+        kept = len(files) - len(doomed)
+        if self.max_files is not None and kept > self.max_files:
+            doomed += [path for _, path in files[len(doomed):len(doomed) + kept - self.max_files]]
+        for path in doomed:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(doomed)
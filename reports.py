@@ -0,0 +1,231 @@
+"""
+Patient report PDFs and bulk export for the Patient Management System
+
+``build_patient_report`` only reads attributes, so it renders an ORM patient
+for a single download just as well as the plain ``patient_report_data`` copy
+sent to worker processes for a bulk export (ORM objects cannot be pickled).
+
+``render_reports`` renders many reports on a process pool, keeping only a
+small window of them in flight, for bulk exports and bulk mailings.
+``stream_reports_zip`` yields the ZIP archive chunk by chunk as each PDF
+completes; it is written to a non-seekable sink, so memory does not grow
+with the number of patients beyond the ZIP central directory (about a
+hundred bytes per file).
+"""
+
+import io
+import multiprocessing
+import zipfile
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from types import SimpleNamespace
+
+from pdf_styles import get_pdf_styles
+
+PATIENT_FIELDS = (
+    'id', 'name', 'email', 'phone', 'date_of_birth', 'address', 'height', 'weight',
+    'past_illnesses', 'current_medications', 'allergies', 'food_habits'
+)
+DISEASE_FIELDS = ('name', 'diagnosis_date', 'status', 'notes')
+MEDICATION_FIELDS = ('name', 'dosage', 'frequency', 'start_date', 'end_date', 'status')
+
+
+def build_patient_report(patient):
+    """Patient report PDF (personal data, history, diseases, medications) as bytes"""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer
+    from reportlab.lib.units import inch
+
+    # Create PDF report
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    story = []
+
+    # Styles, shared by every document
+    styles = get_pdf_styles()
+
+    # Title
+    story.append(Paragraph(f"Patient Report - {patient.name}", styles.report_title))
+    story.append(Spacer(1, 12))
+
+    # Personal Information
+    story.append(Paragraph("Personal Information", styles.heading))
+    personal_data = [
+        ['Name', patient.name],
+        ['Email', patient.email],
+        ['Phone', patient.phone],
+        ['Date of Birth', patient.date_of_birth.strftime('%B %d, %Y')],
+        ['Address', patient.address],
+        ['Height', f"{patient.height} cm"],
+        ['Weight', f"{patient.weight} kg"],
+        ['BMI', f"{patient.weight / ((patient.height/100) ** 2):.1f}"]
+    ]
+
+    personal_table = Table(personal_data, colWidths=[2*inch, 4*inch])
+    personal_table.setStyle(styles.data_table(12))
+    story.append(personal_table)
+    story.append(Spacer(1, 12))
+
+    # Medical History
+    story.append(Paragraph("Medical History", styles.heading))
+    medical_data = [
+        ['Past Illnesses', patient.past_illnesses or 'None'],
+        ['Current Medications', patient.current_medications or 'None'],
+        ['Allergies', patient.allergies or 'None'],
+        ['Food Habits', patient.food_habits or 'None']
+    ]
+
+    medical_table = Table(medical_data, colWidths=[2*inch, 4*inch])
+    medical_table.setStyle(styles.data_table(12))
+    story.append(medical_table)
+    story.append(Spacer(1, 12))
+
+    # Diseases
+    if patient.diseases:
+        story.append(Paragraph("Diseases", styles.heading))
+        disease_data = [['Disease', 'Diagnosis Date', 'Status', 'Notes']]
+        for disease in patient.diseases:
+            disease_data.append([
+                disease.name,
+                disease.diagnosis_date.strftime('%Y-%m-%d'),
+                disease.status,
+                disease.notes or ''
+            ])
+
+        disease_table = Table(disease_data, colWidths=[1.5*inch, 1.5*inch, 1*inch, 2*inch])
+        disease_table.setStyle(styles.data_table(10))
+        story.append(disease_table)
+        story.append(Spacer(1, 12))
+
+    # Medications
+    if patient.medications:
+        story.append(Paragraph("Medications", styles.heading))
+        medication_data = [['Medication', 'Dosage', 'Frequency', 'Start Date', 'End Date', 'Status']]
+        for medication in patient.medications:
+            medication_data.append([
+                medication.name,
+                medication.dosage,
+                medication.frequency,
+                medication.start_date.strftime('%Y-%m-%d'),
+                medication.end_date.strftime('%Y-%m-%d') if medication.end_date else 'Ongoing',
+                medication.status
+            ])
+
+        medication_table = Table(medication_data, colWidths=[1.2*inch, 1*inch, 1*inch, 1*inch, 1*inch, 0.8*inch])
+        medication_table.setStyle(styles.data_table(8))
+        story.append(medication_table)
+
+    # Build PDF
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def patient_report_filename(patient):
+    return f"patient_report_{patient.name.replace(' ', '_')}.pdf"
+
+
+def patient_report_data(patient):
+    """Picklable copy of everything ``build_patient_report`` reads from a patient"""
+    def copy(obj, fields):
+        return SimpleNamespace(**{field: getattr(obj, field) for field in fields})
+
+    data = copy(patient, PATIENT_FIELDS)
+    data.diseases = [copy(disease, DISEASE_FIELDS) for disease in patient.diseases]
+    data.medications = [copy(medication, MEDICATION_FIELDS) for medication in patient.medications]
+    return data
+
+
+def report_entry_name(data):
+    """Name of a patient's report inside a bulk export ZIP"""
+    return f"{data.id:06d}_{patient_report_filename(data)}"
+
+
+def render_reports(reports, workers=None, window=None):
+    """Render reports on a process pool, yielding ``(data, pdf, error)`` as each one finishes.
+
+    ``reports`` is an iterable of ``patient_report_data`` copies; it is only
+    consumed as fast as the pool frees up, at most ``window`` reports ahead
+    (two per worker by default). Results come in completion order. When a
+    report fails to render, ``pdf`` is None and ``error`` the exception.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    window = window or workers * 2
+    reports = iter(reports)
+    # 'spawn' workers do not inherit the web process's threads and locks
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        pending = {}
+
+        def fill():
+            while len(pending) < window:
+                data = next(reports, None)
+                if data is None:
+                    return
+                pending[pool.submit(build_patient_report, data)] = data
+
+        fill()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                data = pending.pop(future)
+                try:
+                    pdf = future.result()
+                except Exception as e:
+                    yield data, None, e
+                else:
+                    yield data, pdf, None
+            fill()
+    finally:
+        # Also reached when the consumer stops early, e.g. the client disconnected
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _ZipSink:
+    """Write-only file object collecting what ZipFile writes until it is drained.
+
+    Having no ``seek``/``tell`` makes ZipFile stream each entry with a data
+    descriptor instead of going back to patch its header.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def stream_reports_zip(reports, workers=None, window=None):
+    """Yield a ZIP of patient reports chunk by chunk, rendering them with ``render_reports``.
+
+    Entries are added in completion order. Reports that fail to render are
+    listed in an ``ERRORS.txt`` entry instead of aborting the whole archive.
+    """
+    sink = _ZipSink()
+    errors = []
+    with closing(render_reports(reports, workers, window)) as rendered:
+        with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for data, pdf, error in rendered:
+                if error is not None:
+                    errors.append(f"{data.id}\t{data.name}\t{error}")
+                    continue
+                archive.writestr(report_entry_name(data), pdf)
+                yield sink.drain()
+
+            if errors:
+                archive.writestr('ERRORS.txt', '\n'.join(['patient_id\tname\terror'] + errors) + '\n')
+    # Closing the archive wrote the central directory
+    yield sink.drain()
+
+
+def export_filename():
+    return f"patient_reports_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
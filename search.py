@@ -0,0 +1,372 @@
+"""
+Patient search backends for the Patient Management System
+
+Every backend answers the same question as the original ``/search_patients``
+query: which patients contain the search text in their name, email, phone or
+address. They differ in how they find them:
+
+- ``like``: the original ``ILIKE '%q%'`` scan, kept as the reference.
+- ``trigram``: an in-process trigram index kept in sync with patient writes.
+- ``fulltext``: a MySQL FULLTEXT index using the ngram parser.
+
+All backends return patient ids ranked best match first.
+"""
+
+import heapq
+import threading
+import time
+import unicodedata
+from array import array
+from itertools import chain
+
+SEARCH_FIELDS = ('name', 'email', 'phone', 'address')
+
+# How much a match in each field is worth when ranking results
+FIELD_WEIGHTS = (4.0, 3.0, 2.0, 1.0)
+
+FULLTEXT_INDEX_NAME = 'ft_patient_search'
+FULLTEXT_INDEX_DDL = (
+    f"ALTER TABLE patient ADD FULLTEXT INDEX {FULLTEXT_INDEX_NAME} "
+    "(name, email, phone, address) WITH PARSER ngram"
+)
+
+
+def normalize(text):
+    """Lowercase and strip accents, like MySQL's accent-insensitive collations"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def trigrams(text):
+    """Set of 3-character substrings of an already normalized string"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def score_match(query, fields):
+    """Rank a candidate for a normalized query; 0 means it does not match.
+
+    A match in a heavier field scores higher, a match at the start of a
+    field or of a word scores higher than one in the middle.
+    """
+    score = 0.0
+    for weight, value in zip(FIELD_WEIGHTS, fields):
+        position = value.find(query)
+        if position < 0:
+            continue
+        if position == 0:
+            score += weight * 3
+        elif not value[position - 1].isalnum():
+            score += weight * 2
+        else:
+            score += weight
+    return score
+
+
+def rank(query, candidates, limit):
+    """Top ``limit`` ids from ``(id, normalized_fields)`` pairs"""
+    scored = []
+    for patient_id, fields in candidates:
+        score = score_match(query, fields)
+        if score:
+            scored.append((score, -patient_id, patient_id))
+    return [patient_id for _, _, patient_id in heapq.nlargest(limit, scored)]
+
+
+class SearchBackend:
+    """Base class; subclasses implement ``search`` and optionally keep an index"""
+
+    name = None
+
+    def __init__(self, db, model):
+        self.db = db
+        self.model = model
+
+    def search(self, query, limit=10):
+        raise NotImplementedError
+
+    def candidates(self, query, limit):
+        """Unranked ids of up to ``limit`` patients matching ``query``.
+
+        Unlike ``search`` this is meant to be exhaustive: if fewer than
+        ``limit`` ids come back, they are every match there is.
+        """
+        raise NotImplementedError
+
+    def upsert(self, patient_id, fields):
+        """A patient was inserted or updated; ``fields`` maps SEARCH_FIELDS to values"""
+
+    def remove(self, patient_id):
+        """A patient was deleted"""
+
+
+class LikeSearchBackend(SearchBackend):
+    """The original ILIKE scan over the four searchable columns"""
+
+    name = 'like'
+
+    def _matching(self, query, *columns):
+        model = self.model
+        pattern = f'%{query}%'
+        return self.db.session.query(*columns).filter(
+            self.db.or_(
+                model.name.ilike(pattern),
+                model.email.ilike(pattern),
+                model.phone.ilike(pattern),
+                model.address.ilike(pattern)
+            )
+        )
+
+    def search(self, query, limit=10):
+        model = self.model
+        rows = self._matching(query, model.id, model.name, model.email, model.phone, model.address).limit(limit).all()
+        return rank(normalize(query), [(row[0], tuple(normalize(v) for v in row[1:])) for row in rows], limit)
+
+    def candidates(self, query, limit):
+        return [row[0] for row in self._matching(query, self.model.id).limit(limit)]
+
+
+class MySQLFulltextSearchBackend(SearchBackend):
+    """MATCH ... AGAINST over the ngram FULLTEXT index ``ft_patient_search``"""
+
+    name = 'fulltext'
+
+    # Characters with a meaning in boolean mode
+    BOOLEAN_OPERATORS = '+-<>()~*"@'
+
+    def _match_ids(self, query, limit, ranked):
+        cleaned = ''.join(c for c in query if c not in self.BOOLEAN_OPERATORS).strip()
+        if not cleaned:
+            return []
+        # A quoted phrase makes the ngrams match contiguously, like a substring
+        match = "MATCH (name, email, phone, address) AGAINST (:q IN BOOLEAN MODE)"
+        order = f"ORDER BY {match} DESC, id DESC " if ranked else ""
+        rows = self.db.session.execute(
+            self.db.text(f"SELECT id FROM {self.model.__tablename__} WHERE {match} {order}LIMIT :limit"),
+            {'q': f'"{cleaned}"', 'limit': limit}
+        ).all()
+        return [row[0] for row in rows]
+
+    def search(self, query, limit=10):
+        return self._match_ids(query, limit, ranked=True)
+
+    def candidates(self, query, limit):
+        return self._match_ids(query, limit, ranked=False)
+
+
+class TrigramIndex:
+    """In-memory trigram index over the searchable patient fields.
+
+    Each patient's normalized fields are joined into one document string
+    and every trigram of it maps to the ids containing it. A query takes the
+    rarest of its trigrams and verifies the full substring against each
+    candidate document, so results match what ``ILIKE '%q%'`` returns.
+
+    Postings are compact sorted ``array('I')`` built in bulk, plus small
+    sets for patients added since the last compaction. Updated or deleted
+    patients may leave stale posting entries behind; they are harmless
+    because every candidate is verified against its current document, and
+    they disappear on the next full build.
+    """
+
+    SEPARATOR = '\x1f'
+
+    def __init__(self, compact_threshold=10000):
+        self.postings = {}
+        self.pending = {}
+        self.pending_count = 0
+        self.docs = {}
+        self.compact_threshold = compact_threshold
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    @classmethod
+    def document(cls, fields):
+        return cls.SEPARATOR.join(normalize(fields.get(field)) for field in SEARCH_FIELDS)
+
+    def bulk_load(self, rows):
+        """Build from ``(id, fields)`` pairs sorted by ascending id; replaces the contents"""
+        postings = {}
+        docs = {}
+        for patient_id, fields in rows:
+            doc = self.document(fields)
+            docs[patient_id] = doc
+            for gram in trigrams(doc):
+                ids = postings.get(gram)
+                if ids is None:
+                    ids = postings[gram] = array('I')
+                ids.append(patient_id)
+        with self.lock:
+            self.postings = postings
+            self.pending = {}
+            self.pending_count = 0
+            self.docs = docs
+
+    def add(self, patient_id, fields):
+        doc = self.document(fields)
+        with self.lock:
+            previous = self.docs.get(patient_id)
+            self.docs[patient_id] = doc
+            old_grams = trigrams(previous) if previous else set()
+            for gram in trigrams(doc) - old_grams:
+                self.pending.setdefault(gram, set()).add(patient_id)
+                self.pending_count += 1
+            if self.pending_count >= self.compact_threshold:
+                self.compact()
+
+    def remove(self, patient_id):
+        with self.lock:
+            self.docs.pop(patient_id, None)
+
+    def compact(self):
+        """Merge the pending sets into the sorted posting arrays"""
+        with self.lock:
+            for gram, added in self.pending.items():
+                merged = set(self.postings.get(gram, ()))
+                merged |= added
+                self.postings[gram] = array('I', sorted(merged))
+            self.pending = {}
+            self.pending_count = 0
+
+    def _posting_size(self, gram):
+        return len(self.postings.get(gram, ())) + len(self.pending.get(gram, ()))
+
+    def _candidates(self, query):
+        """Ids that may contain ``query``, newest first"""
+        grams = trigrams(query)
+        if not grams:
+            # One or two characters have no trigram; every document is a candidate
+            return reversed(self.docs)
+        rarest = min(grams, key=self._posting_size)
+        recent = self.pending.get(rarest, set())
+        return chain(recent, (i for i in reversed(self.postings.get(rarest, ())) if i not in recent))
+
+    def matches(self, query, limit):
+        """Up to ``limit`` ``(id, document)`` pairs containing the normalized query, newest first"""
+        found = []
+        with self.lock:
+            docs = self.docs
+            for patient_id in self._candidates(query):
+                doc = docs.get(patient_id)
+                if doc is not None and query in doc:
+                    found.append((patient_id, doc))
+                    if len(found) >= limit:
+                        break
+        return found
+
+    def search(self, query, limit=10, max_matches=1000):
+        """Ranked ids of the documents containing ``query``.
+
+        Very broad queries (a common name, two letters) can match a large
+        share of the table; only the newest ``max_matches`` matches are
+        ranked so the cost per keystroke stays bounded.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        separator = self.SEPARATOR
+        return rank(query, ((i, doc.split(separator)) for i, doc in self.matches(query, max_matches)), limit)
+
+
+class TrigramSearchBackend(SearchBackend):
+    """Search through a per-process TrigramIndex.
+
+    The index is built from the database on first use and kept current by
+    ``upsert``/``remove`` calls for writes made in this process. Writes made
+    by other worker processes are picked up by a cheap version check
+    (``COUNT(*)`` and ``MAX(updated_at)``) at most every ``sync_interval``
+    seconds.
+    """
+
+    name = 'trigram'
+
+    def __init__(self, db, model, batch_size=5000, sync_interval=5.0):
+        super().__init__(db, model)
+        self.index = TrigramIndex()
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.built = False
+        self.version = None
+        self.last_sync = 0.0
+        self.build_lock = threading.Lock()
+
+    def _columns(self):
+        model = self.model
+        return (model.id, model.name, model.email, model.phone, model.address)
+
+    def _rows(self, query):
+        for row in query:
+            yield row[0], dict(zip(SEARCH_FIELDS, row[1:]))
+
+    def _current_version(self):
+        model = self.model
+        return tuple(self.db.session.query(self.db.func.count(model.id), self.db.func.max(model.updated_at)).one())
+
+    def build(self):
+        """(Re)build the whole index from the patient table in batches"""
+        with self.build_lock:
+            version = self._current_version()
+            index = TrigramIndex()
+            query = self.db.session.query(*self._columns()).order_by(self.model.id)
+            index.bulk_load(self._rows(query.yield_per(self.batch_size)))
+            self.index = index
+            self.version = version
+            self.built = True
+            self.last_sync = time.monotonic()
+
+    def sync(self):
+        """Pick up patients changed by other processes since the last build/sync"""
+        count, max_updated = version = self._current_version()
+        if version == self.version:
+            return
+        previous_max = self.version[1] if self.version else None
+        if previous_max is not None and max_updated is not None:
+            changed = self.db.session.query(*self._columns()).filter(self.model.updated_at >= previous_max)
+            for patient_id, fields in self._rows(changed):
+                self.index.add(patient_id, fields)
+        if len(self.index) != count:
+            # Deletes (or rows without updated_at) cannot be found incrementally
+            self.build()
+            return
+        self.version = version
+
+    def _ensure_current(self):
+        if not self.built:
+            self.build()
+        elif time.monotonic() - self.last_sync >= self.sync_interval:
+            self.last_sync = time.monotonic()
+            self.sync()
+
+    def search(self, query, limit=10):
+        self._ensure_current()
+        return self.index.search(query, limit)
+
+    def candidates(self, query, limit):
+        self._ensure_current()
+        return [patient_id for patient_id, _ in self.index.matches(normalize(query), limit)]
+
+    def upsert(self, patient_id, fields):
+        if self.built:
+            self.index.add(patient_id, fields)
+
+    def remove(self, patient_id):
+        if self.built:
+            self.index.remove(patient_id)
+
+
+SEARCH_BACKENDS = {
+    backend.name: backend
+    for backend in (LikeSearchBackend, TrigramSearchBackend, MySQLFulltextSearchBackend)
+}
+
+
+def create_search_backend(name, db, model, **options):
+    """Instantiate the backend configured by ``SEARCH_BACKEND``"""
+    try:
+        backend_class = SEARCH_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown search backend '{name}', expected one of {', '.join(SEARCH_BACKENDS)}")
+    return backend_class(db, model, **options)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Email Outbox Sender Script for Patient Management System
+Sends the queued messages of the email outbox outside the web processes
+
+Usage:
+    python send_outbox.py           # keep running, like the in-process worker
+    python send_outbox.py --once    # send what is due now and exit (cron)
+
+Run the web app with OUTBOX_WORKER = False when this script is the only sender.
+"""
+
+import argparse
+import logging
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, get_outbox_worker
+
+def send_outbox(once=False):
+    """Drain the outbox once, or keep polling it until interrupted"""
+    with app.app_context():
+        # Make sure the outbox table exists
+        db.create_all()
+        worker = get_outbox_worker()
+
+    if once:
+        try:
+            claimed = worker.drain()
+        except Exception as e:
+            print(f"❌ Error sending queued email: {e}")
+            return False
+        print(f"✅ Processed {claimed} queued message(s)")
+        return True
+
+    print(f"📧 Sending queued email every {worker.poll_interval}s (Ctrl+C to stop)")
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='send what is due now and exit')
+    args = parser.parse_args()
+    # Sends, retries and archive failures are logged by app.py and outbox.py
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    sys.exit(0 if send_outbox(args.once) else 1)
@@ -0,0 +1,171 @@
+"""
+Pool of authenticated SMTP sessions for outgoing mail
+
+Opening a session costs a TCP connect, the TLS handshake and the login, i.e.
+several round trips before the first message can go out. The pool keeps
+sessions open after use and hands them to the next send, so consecutive
+messages (an outbox batch, a bulk mailing) share one session each.
+
+- at most ``max_connections`` sessions exist at once; further senders wait
+- a session idle for more than ``check_after`` seconds is checked with NOOP
+  before reuse, and one idle longer than ``max_idle`` is not reused at all
+- a session is retired after ``max_messages`` messages, as many providers
+  limit messages per connection
+- a send on a reused session that finds it dropped reconnects and tries once more
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SmtpPoolTimeout(Exception):
+    """No session became available within the pool timeout"""
+
+
+class _Session:
+    __slots__ = ('server', 'last_used', 'messages', 'reused')
+
+    def __init__(self, server):
+        self.server = server
+        self.last_used = time.monotonic()
+        self.messages = 0
+        self.reused = False
+
+
+class SmtpPool:
+    """Reusable SMTP sessions configured like EMAIL_CONFIG"""
+
+    def __init__(self, config, max_connections=4, max_idle=60, check_after=5, max_messages=100, timeout=30):
+        self.config = config
+        self.max_connections = max_connections
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.max_messages = max_messages
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.lock = threading.Lock()
+        self.idle = []  # most recently used last
+        self.stats = {'connects': 0, 'reuses': 0, 'noop_failures': 0, 'reconnects': 0, 'messages': 0}
+
+    def _connect(self):
+        import smtplib
+
+        config = self.config
+        if config.get('use_ssl', False):
+            server = smtplib.SMTP_SSL(config['smtp_server'], config['smtp_port'], timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(config['smtp_server'], config['smtp_port'], timeout=self.timeout)
+            if config.get('use_tls', False):
+                server.starttls()
+        try:
+            if config.get('sender_password'):
+                server.login(config['sender_email'], config['sender_password'])
+        except Exception:
+            self._close(server)
+            raise
+        with self.lock:
+            self.stats['connects'] += 1
+        return _Session(server)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _healthy(self, session):
+        idle_for = time.monotonic() - session.last_used
+        if idle_for > self.max_idle:
+            return False
+        if idle_for <= self.check_after:
+            return True
+        try:
+            code, _ = session.server.noop()
+        except Exception:
+            code = None
+        if code != 250:
+            with self.lock:
+                self.stats['noop_failures'] += 1
+            return False
+        return True
+
+    def _checkout(self):
+        """A healthy idle session, or None if a new one has to be opened"""
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                session = self.idle.pop()
+            if self._healthy(session):
+                session.reused = True
+                with self.lock:
+                    self.stats['reuses'] += 1
+                return session
+            self._close(session.server)
+
+    def _checkin(self, session):
+        session.last_used = time.monotonic()
+        if session.messages >= self.max_messages:
+            self._close(session.server)
+            return
+        with self.lock:
+            self.idle.append(session)
+
+    @contextmanager
+    def session(self):
+        """Exclusive use of one session; it goes back to the pool unless an error escaped"""
+        if not self.slots.acquire(timeout=self.timeout):
+            raise SmtpPoolTimeout(f'No SMTP session free after {self.timeout}s')
+        session = None
+        try:
+            session = self._checkout() or self._connect()
+            yield session
+        except BaseException:
+            if session is not None:
+                self._close(session.server)
+            raise
+        else:
+            self._checkin(session)
+        finally:
+            self.slots.release()
+
+    def send(self, recipient, msg):
+        """Send ``msg`` to ``recipient`` on a pooled session"""
+        import smtplib
+
+        sender = self.config['sender_email']
+        data = msg.as_string()
+        refused = None
+        with self.session() as session:
+            try:
+                session.server.sendmail(sender, recipient, data)
+            except smtplib.SMTPServerDisconnected:
+                if not session.reused:
+                    raise
+                # The server dropped the idle session between the check and the send
+                self._close(session.server)
+                fresh = self._connect()
+                session.server, session.messages, session.reused = fresh.server, 0, False
+                with self.lock:
+                    self.stats['reconnects'] += 1
+                session.server.sendmail(sender, recipient, data)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                # The server answered (and smtplib reset the transaction): keep the session
+                refused = e
+            session.messages += 1
+        if refused is not None:
+            raise refused
+        with self.lock:
+            self.stats['messages'] += 1
+
+    def close(self):
+        """Close every idle session; sessions in use still return to the pool"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for session in idle:
+            self._close(session.server)
@@ -0,0 +1,128 @@
+"""
+Stale-while-revalidate snapshots of expensive aggregates
+
+A SnapshotRefresher keeps the last computed result in memory and hands it
+out immediately. A daemon thread recomputes it when it gets older than
+``max_age`` seconds or after ``max_writes`` relevant writes, so requests
+never wait for the computation except the very first one.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """One computed result plus a content version for ETags and cache keys"""
+
+    __slots__ = ('data', 'version', 'computed_at', 'taken_at')
+
+    def __init__(self, data, computed_at):
+        self.data = data
+        self.taken_at = datetime.now()
+        self.version = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        self.computed_at = computed_at
+
+    @property
+    def age(self):
+        return time.monotonic() - self.computed_at
+
+
+class SnapshotRefresher:
+    """Serve the last snapshot of ``compute()`` and refresh it in the background.
+
+    ``compute`` runs inside ``app.app_context()`` on the refresher thread.
+    ``on_refresh(snapshot)`` is called there after each background refresh,
+    e.g. to warm caches derived from the new data.
+    """
+
+    # Seconds to wait after a failed refresh before trying again
+    RETRY_DELAY = 30
+
+    def __init__(self, app, compute, max_age=300, max_writes=50, on_refresh=None):
+        self.app = app
+        self.compute = compute
+        self.max_age = max_age
+        self.max_writes = max_writes
+        self.on_refresh = on_refresh
+        self.snapshot = None
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.stopping = False
+
+    def get(self):
+        """The current snapshot; computed synchronously only if there is none yet"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            with self.refresh_lock:
+                if self.snapshot is None:
+                    self._refresh()
+            snapshot = self.snapshot
+        elif self.is_stale(snapshot):
+            self.wake.set()
+        self._ensure_thread()
+        return snapshot
+
+    def is_stale(self, snapshot=None):
+        snapshot = snapshot or self.snapshot
+        return snapshot is None or snapshot.age >= self.max_age or self.writes >= self.max_writes
+
+    def note_write(self, count=1):
+        """Count writes that affect the data; enough of them trigger a refresh"""
+        with self.lock:
+            self.writes += count
+            trigger = self.writes >= self.max_writes
+        if trigger:
+            self.wake.set()
+
+    def stop(self):
+        self.stopping = True
+        self.wake.set()
+
+    def _refresh(self):
+        with self.lock:
+            seen_writes = self.writes
+        started = time.monotonic()
+        with self.app.app_context():
+            data = self.compute()
+        self.snapshot = Snapshot(data, started)
+        with self.lock:
+            # Writes that arrived during the computation may not be included
+            self.writes -= seen_writes
+        return self.snapshot
+
+    def _ensure_thread(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='snapshot-refresher', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while not self.stopping:
+            snapshot = self.snapshot
+            timeout = self.max_age - snapshot.age if snapshot else self.max_age
+            self.wake.wait(timeout=max(timeout, 0.1))
+            self.wake.clear()
+            if self.stopping or not self.is_stale():
+                continue
+            try:
+                with self.refresh_lock:
+                    snapshot = self._refresh()
+                if self.on_refresh is not None:
+                    with self.app.app_context():
+                        self.on_refresh(snapshot)
+            except Exception:
+                # Keep serving the previous snapshot and retry a bit later
+                logger.exception('Snapshot refresh failed')
+                self.wake.wait(timeout=min(self.max_age, self.RETRY_DELAY))
+                self.wake.clear()
@@ -0,0 +1,137 @@
+"""
+Prefix-incremental typeahead cache for the patient search box
+
+The search box sends a request per keystroke ("mar", "mari", "maria"). Every
+patient matching "maria" also matches "mari", so once the complete match set
+of a short query is known, longer queries typed on top of it are answered by
+filtering that set in memory instead of asking the database again.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from search import TrigramIndex, normalize, rank
+
+# Rough per-row and per-entry overhead of the Python objects, in bytes
+ROW_OVERHEAD = 240
+ENTRY_OVERHEAD = 200
+
+
+class TypeaheadRow:
+    """What the search endpoint needs to render and re-rank one patient"""
+
+    __slots__ = ('id', 'name', 'email', 'phone', 'date_of_birth', 'document')
+
+    def __init__(self, id, name, email, phone, date_of_birth, address):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.date_of_birth = date_of_birth
+        self.document = TrigramIndex.document(
+            {'name': name, 'email': email, 'phone': phone, 'address': address}
+        )
+
+    @property
+    def size(self):
+        return ROW_OVERHEAD + len(self.document) + len(self.name) + len(self.email) + len(self.phone)
+
+
+class TypeaheadCache:
+    """LRU cache of search results keyed by normalized query.
+
+    Two kinds of entries are kept:
+
+    - complete: every patient matching the query (at most ``max_candidates``
+      rows). Any longer query starting with it is narrowed from these rows.
+    - ranked: only the top results of a broad query, reusable for that exact
+      query only.
+
+    Entries expire after ``ttl`` seconds, which bounds staleness from writes
+    made by other processes; writes made in this process call ``clear()``.
+    The total estimated size is kept under ``max_bytes`` by evicting the
+    least recently used entries.
+    """
+
+    def __init__(self, max_bytes=8 * 1024 * 1024, max_candidates=500, ttl=60):
+        self.max_bytes = max_bytes
+        self.max_candidates = max_candidates
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'narrowed': 0, 'misses': 0, 'evictions': 0}
+
+    def lookup(self, query, limit=10):
+        """Ranked rows for ``query`` from the cache, or None on a miss"""
+        key = normalize(query)
+        now = time.monotonic()
+        with self.lock:
+            entry = self._get(key, now)
+            if entry is not None:
+                self.stats['hits'] += 1
+                complete, rows = entry[1], entry[2]
+                return self._rank(key, rows, limit) if complete else rows[:limit]
+
+            # Longest cached prefix with a complete match set
+            for end in range(len(key) - 1, 0, -1):
+                entry = self._get(key[:end], now)
+                if entry is not None and entry[1]:
+                    rows = [row for row in entry[2] if key in row.document]
+                    self._put(key, True, rows, now)
+                    self.stats['narrowed'] += 1
+                    return self._rank(key, rows, limit)
+
+            self.stats['misses'] += 1
+            return None
+
+    def store(self, query, rows, complete, limit=10):
+        """Cache the result of a query that missed and return its ranked rows.
+
+        ``complete`` says whether ``rows`` holds every match (it is then
+        used to narrow longer queries) or just the ranked top results.
+        """
+        key = normalize(query)
+        rows = list(rows)
+        with self.lock:
+            self._put(key, complete, rows, time.monotonic())
+        return self._rank(key, rows, limit) if complete else rows[:limit]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def _rank(self, key, rows, limit):
+        by_id = {row.id: row for row in rows}
+        separator = TrigramIndex.SEPARATOR
+        ranked = rank(key, ((row.id, row.document.split(separator)) for row in rows), limit)
+        return [by_id[row_id] for row_id in ranked]
+
+    def _get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[0] > self.ttl:
+            self._drop(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, complete, rows, now):
+        if key in self.entries:
+            self._drop(key)
+        size = ENTRY_OVERHEAD + len(key) + sum(row.size for row in rows)
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (now, complete, rows, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._drop(oldest)
+            self.stats['evictions'] += 1
+
+    def _drop(self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry[3]
@@ -1,56 +1,66 @@
 #!/usr/bin/env python3
 """
 Database Update Script for Patient Management System
-Adds new tables for prescriptions and diagnoses
+Applies the pending schema migrations (see migrations.py)
+
+Usage:
+    python update_database.py --dry-run
+    python update_database.py
+    python update_database.py --batch-size 500 --pause 0.5
+    python update_database.py --status
+
+Migrations are safe to run while the clinic is open: columns are added
+without rewriting the table and existing rows are updated in small batches,
+pausing between them. A run that is interrupted can simply be started again.
 """
 
+import argparse
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app, db, Prescription, Diagnosis, Payment
+from app import app, db
+from migrations import Migrator
+
+def show_status(migrator):
+    applied = migrator.applied()
+    for migration in migrator.migrations:
+        if migration.version in applied:
+            print(f"   ✅ {migration.version}: {migration.description} ({applied[migration.version]:%Y-%m-%d %H:%M})")
+        else:
+            print(f"   ⏳ {migration.version}: {migration.description}")
 
-def update_database():
-    """Update database with new tables"""
+def update_database(dry_run=False, batch_size=1000, pause=0.1, status=False):
+    """Apply (or list) the pending migrations"""
     with app.app_context():
+        migrator = Migrator(db, batch_size=batch_size, pause=pause)
         try:
-            # Create new tables
-            db.create_all()
-            print("✅ Database updated successfully!")
-            print("✅ New tables created:")
-            print("   - prescriptions")
-            print("   - diagnoses")
-            print("   - payments")
-            
-            # Add professional_license column to existing tables if it doesn't exist
-            try:
-                # Add column to diagnosis table
-                db.engine.execute("ALTER TABLE diagnosis ADD COLUMN professional_license VARCHAR(50) DEFAULT '12345678'")
-                print("✅ Added professional_license column to diagnosis table")
-            except Exception as e:
-                print(f"ℹ️  professional_license column already exists in diagnosis table or error: {e}")
-            
-            try:
-                # Add column to prescription table
-                db.engine.execute("ALTER TABLE prescription ADD COLUMN professional_license VARCHAR(50) DEFAULT '12345678'")
-                print("✅ Added professional_license column to prescription table")
-            except Exception as e:
-                print(f"ℹ️  professional_license column already exists in prescription table or error: {e}")
-            
-            # Check if tables exist
-            from sqlalchemy import inspect
-            inspector = inspect(db.engine)
-            tables = inspector.get_table_names()
-            
-            print(f"\n📊 Current tables in database:")
-            for table in tables:
-                print(f"   - {table}")
-                
+            if status:
+                print(f"📊 Schema migrations ({db.engine.url.render_as_string(hide_password=True)}):")
+                show_status(migrator)
+                return True
+
+            if dry_run:
+                print("🔍 Dry run: nothing will be changed")
+            applied = migrator.run(dry_run=dry_run)
+            if not applied:
+                print("✅ Database is up to date")
+            elif dry_run:
+                print(f"\n📋 {len(applied)} migration(s) pending; run without --dry-run to apply them")
+            else:
+                print(f"\n✅ Applied {len(applied)} migration(s)")
         except Exception as e:
             print(f"❌ Error updating database: {e}")
+            print("   Fix the problem and run the script again; finished steps are not repeated")
             return False
-    
+
     return True
 
 if __name__ == "__main__":
-    update_database() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dry-run', action='store_true', help='show what would be done without changing anything')
+    parser.add_argument('--status', action='store_true', help='list the migrations and whether they were applied')
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows updated per transaction in backfills')
+    parser.add_argument('--pause', type=float, default=0.1, help='seconds to wait between backfill batches')
+    args = parser.parse_args()
+    sys.exit(0 if update_database(args.dry_run, args.batch_size, args.pause, args.status) else 1)